@@ -1,18 +1,20 @@
 from typing import Any
 
+from abstracts.slot_set import SlotSet
+
 attribute_templates = [
     ["days_in_view", list],
     ["web_elements_in_view", dict],
     ["times_in_view", list],
 
-    ["available_sessions", dict],
+    ["available_sessions", SlotSet],
 
-    ["reserved_sessions", dict],
-    ["booked_sessions", dict],
+    ["reserved_sessions", SlotSet],
+    ["booked_sessions", SlotSet],
     ["lesson_name", str],
 
-    ["earlier_sessions", dict],
-    ["cached_earlier_sessions", dict],
+    ["earlier_sessions", SlotSet],
+    ["cached_earlier_sessions", SlotSet],
 ]
 
 
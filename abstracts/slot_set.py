@@ -0,0 +1,125 @@
+import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple, Union
+
+
+class Slot:
+    """A single session, parsed once from its "dd/Mon/YYYY" date and "HH:MM - HH:MM" time strings."""
+
+    __slots__ = ("date_str", "time_str", "date", "start", "end")
+
+    def __init__(self, date_str: str, time_str: str):
+        self.date_str = date_str
+        self.time_str = time_str
+        self.date = datetime.datetime.strptime(date_str, "%d/%b/%Y").date()
+
+        start_str, _, end_str = time_str.partition(" - ")
+        self.start = datetime.datetime.combine(self.date, datetime.datetime.strptime(start_str, "%H:%M").time())
+        self.end = (datetime.datetime.combine(self.date, datetime.datetime.strptime(end_str, "%H:%M").time())
+                    if end_str else self.start)
+
+    @property
+    def element_key(self):
+        # Key of the slot's button in web_elements_in_view
+        return f"{self.date_str} : {self.time_str}"
+
+    def __eq__(self, other):
+        return isinstance(other, Slot) and self.start == other.start and self.end == other.end
+
+    def __lt__(self, other: "Slot"):
+        return (self.start, self.end) < (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"Slot({self.date_str} : {self.time_str})"
+
+
+@lru_cache(maxsize=4096)
+def parse_slot(date_str: str, time_str: str) -> Slot:
+    return Slot(date_str, time_str)
+
+
+class SlotSet:
+    """Set of sessions with O(1) membership and a lazily sorted view for chronological iteration and "last".
+
+    Iterating over it yields Slots in chronological order; items() groups them per date the same way the old
+    {"dd/Mon/YYYY": ["HH:MM - HH:MM", ...]} dicts did, for rendering notifications.
+    """
+
+    __slots__ = ("_slots", "_sorted")
+
+    def __init__(self, slots: Iterable[Slot] = ()):
+        self._slots = set(slots)
+        self._sorted = None
+
+    @classmethod
+    def from_dict(cls, sessions: Dict[str, List[str]]):
+        return cls(parse_slot(date_str, time_str) for date_str, time_strs in sessions.items() for time_str in time_strs)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {date_str: list(time_strs) for date_str, time_strs in self.items()}
+
+    def sorted(self) -> List[Slot]:
+        if self._sorted is None:
+            self._sorted = sorted(self._slots)
+        return self._sorted
+
+    def add(self, date_str: str, time_str: str):
+        self.add_slot(parse_slot(date_str, time_str))
+
+    def add_slot(self, slot: Slot):
+        if slot not in self._slots:
+            self._slots.add(slot)
+            self._sorted = None
+
+    def discard(self, slot: Slot):
+        if slot in self._slots:
+            self._slots.discard(slot)
+            self._sorted = None
+
+    def copy(self):
+        return SlotSet(self._slots)
+
+    def __contains__(self, slot: Union[Slot, Tuple[str, str]]):
+        if isinstance(slot, tuple):
+            slot = parse_slot(*slot)
+        return slot in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __bool__(self):
+        return bool(self._slots)
+
+    def __iter__(self):
+        return iter(self.sorted())
+
+    def __eq__(self, other):
+        return isinstance(other, SlotSet) and self._slots == other._slots
+
+    def __sub__(self, other: "SlotSet"):
+        return SlotSet(self._slots - other._slots)
+
+    def __or__(self, other: "SlotSet"):
+        return SlotSet(self._slots | other._slots)
+
+    def __str__(self):
+        return str(self.to_dict())
+
+    def __repr__(self):
+        return f"SlotSet({self.to_dict()})"
+
+    def items(self):
+        grouped = {}
+        for slot in self.sorted():
+            grouped.setdefault(slot.date_str, []).append(slot.time_str)
+        return grouped.items()
+
+    def dates(self) -> List[datetime.date]:
+        return sorted({slot.date for slot in self._slots})
+
+    def last(self) -> Union[Slot, None]:
+        slots = self.sorted()
+        return slots[-1] if slots else None
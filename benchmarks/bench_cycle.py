@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.getcwd())
+
+from benchmarks.fixtures import load_fixtures
+from benchmarks.replay_driver import ReplayDriver
+from src.mock_portal.stub_captcha import StubCaptcha
+from src.utils.log import Log
+from src.utils.notifications.notification_manager import NotificationManager
+from src.website_handler import handler
+
+BASELINE_FILE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_SIZES = ["7x10", "30x10", "90x10"]
+DEFAULT_TYPES = ["practical", "simulator", "btt", "pt"]
+BOOKING_PORT = "8001"
+
+LOG_CONFIG = {
+    "log_level": 4,
+    "print_log_to_output": False,
+    "write_log_to_file": False,
+    "clear_logs_init": False,
+    "appends_stack_call_to_log": False,
+    "save_solved_captchas": False
+}
+
+PROGRAM_CONFIG = {
+    "auto_reserve": True,
+    "auto_restart": False,
+    "reserve_for_same_day": True,
+    "book_from_other_teams": False,
+    "refresh_rate": 0,
+    "slots_per_type": {"simulator": 3, "practical": 6, "btt": 1, "rtt": 1, "ftt": 1, "pt": 1},
+}
+
+
+class StageResult:
+    def __init__(self):
+        self.wall_time = 0.0
+        self.round_trips = 0
+        self.peak_kib = 0.0
+
+    def to_dict(self):
+        return {"wall_time": round(self.wall_time, 4), "round_trips": self.round_trips,
+                "peak_kib": round(self.peak_kib, 1)}
+
+
+def time_stage(results: Dict[str, StageResult], stage: str, driver: ReplayDriver, callback: Callable):
+    result = results.setdefault(stage, StageResult())
+    round_trips_before = sum(driver.round_trips.values())
+
+    tracemalloc.reset_peak()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    t_start = time.perf_counter()
+
+    callback()
+
+    result.wall_time += time.perf_counter() - t_start
+    _, memory_peak = tracemalloc.get_traced_memory()
+    result.peak_kib = max(result.peak_kib, (memory_peak - memory_before) / 1024)
+    result.round_trips += sum(driver.round_trips.values()) - round_trips_before
+
+
+def run_cycle(days: int, slots_per_day: int, field_types: List[str], record: bool) -> Dict[str, StageResult]:
+    log = Log(directory=os.path.join("benchmarks", "logs"), name="cdc-bench", config=dict(LOG_CONFIG))
+    driver = ReplayDriver(load_fixtures(days, slots_per_day, record), f"http://127.0.0.1:{BOOKING_PORT}/")
+    # Every run starts cold, nothing checkpointed by an earlier run or size is picked up
+    state_directory = tempfile.TemporaryDirectory()
+
+    cdc_handler = handler(
+        login_credentials={"username": "bench", "password": "bench"},
+        captcha_solver=StubCaptcha(log=log),
+        log=log,
+        notification_manager=NotificationManager(log=log),
+        browser_config={"type": "firefox", "headless_mode": True, "booking_url": "http://127.0.0.1:"},
+        program_config=dict(PROGRAM_CONFIG, state_directory=state_directory.name),
+        driver=driver
+    )
+    cdc_handler.port = BOOKING_PORT
+    cdc_handler.logged_in = True
+
+    # Same order as one pass of the loop in main.py
+    results = {}
+    time_stage(results, "open_booking_overview", driver, cdc_handler.open_booking_overview)
+    time_stage(results, "get_booked_lesson_date_time", driver, cdc_handler.get_booked_lesson_date_time)
+    time_stage(results, "get_reserved_lesson_date_time", driver, cdc_handler.get_reserved_lesson_date_time)
+
+    for field_type in field_types:
+        opened = []
+        time_stage(results, "open_field_type_booking_page", driver,
+                   lambda: opened.append(cdc_handler.open_field_type_booking_page(field_type=field_type)))
+        if not opened[0]:
+            continue
+
+        time_stage(results, "get_all_session_date_times", driver,
+                   lambda: cdc_handler.get_all_session_date_times(field_type=field_type))
+        time_stage(results, "get_all_available_sessions", driver,
+                   lambda: cdc_handler.get_all_available_sessions(field_type=field_type))
+        time_stage(results, "check_if_earlier_available_sessions", driver,
+                   lambda: cdc_handler.check_if_earlier_available_sessions(field_type=field_type))
+
+    time_stage(results, "flush_notification_update", driver, cdc_handler.flush_notification_update)
+    state_directory.cleanup()
+    return results
+
+
+def format_delta(value: float, baseline_value: float):
+    if not baseline_value:
+        return ""
+    return f"{(value - baseline_value) / baseline_value * 100:+.0f}%"
+
+
+def print_report(size: str, results: Dict[str, StageResult], baseline: Dict):
+    print(f"\n# {size} (days x slots)")
+    print(f"{'stage':<40}{'wall (s)':>10}{'vs base':>9}{'RPCs':>8}{'vs base':>9}{'peak KiB':>10}")
+
+    total = StageResult()
+    for stage, result in list(results.items()) + [("TOTAL", total)]:
+        if stage != "TOTAL":
+            total.wall_time += result.wall_time
+            total.round_trips += result.round_trips
+            total.peak_kib = max(total.peak_kib, result.peak_kib)
+
+        base = baseline.get(size, {}).get(stage, {})
+        print(f"{stage:<40}{result.wall_time:>10.3f}{format_delta(result.wall_time, base.get('wall_time')):>9}"
+              f"{result.round_trips:>8}{format_delta(result.round_trips, base.get('round_trips')):>9}"
+              f"{result.peak_kib:>10.1f}")
+
+    results["TOTAL"] = total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each stage of one main.py poll cycle against saved pages.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Grid sizes as <days>x<slots>")
+    parser.add_argument("--types", nargs="+", default=DEFAULT_TYPES, help="Monitored types to run")
+    parser.add_argument("--record", action="store_true", help="Re-render the HTML fixtures before running")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINE_FILE}")
+    args = parser.parse_args()
+
+    stored_baseline = {}
+    if os.path.isfile(BASELINE_FILE):
+        with open(BASELINE_FILE) as baseline_file:
+            stored_baseline = json.load(baseline_file)
+
+    tracemalloc.start()
+    all_results = {}
+    for grid_size in args.sizes:
+        grid_days, grid_slots = (int(value) for value in grid_size.split("x"))
+        size_results = run_cycle(grid_days, grid_slots, args.types, args.record)
+        print_report(grid_size, size_results, stored_baseline)
+        all_results[grid_size] = {stage: result.to_dict() for stage, result in size_results.items()}
+    tracemalloc.stop()
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as baseline_file:
+            json.dump(all_results, baseline_file, indent=2)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
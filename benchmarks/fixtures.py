@@ -0,0 +1,60 @@
+import os
+from typing import Dict
+
+from abstracts.cdc_abstract import Types
+from src.mock_portal import pages
+from src.mock_portal.portal import BOOKING_PAGES, MockPortal
+from src.mock_portal.scenario import COURSE_NAMES, THEORY_TEST_NAMES, Scenario
+
+FIXTURES_DIRECTORY = os.path.join("benchmarks", "fixtures")
+
+
+def get_fixture_directory(days: int, slots_per_day: int):
+    return os.path.join(FIXTURES_DIRECTORY, f"{days}x{slots_per_day}")
+
+
+def render_fixtures(days: int, slots_per_day: int, seed: int = 0) -> Dict[str, str]:
+    # Pages as they look once the course is selected, the captcha solved and the T&C accepted
+    portal = MockPortal(Scenario(seed=seed, days=days, slots_per_day=slots_per_day,
+                                 booked_lessons={Types.PRACTICAL: 1, Types.SIMULATOR: 1, Types.PT: 1}))
+    booked, reserved = portal.get_lessons()
+
+    fixtures = {
+        "Dashboard.aspx": pages.dashboard_page(portal.new_view_state("Dashboard.aspx"), booked, reserved),
+        "StatementBooking.aspx": pages.simple_page("Statement", "Booking statement"),
+    }
+
+    for page, field_type in BOOKING_PAGES.items():
+        field_type = field_type or portal.scenario.theory_test
+        fixtures[page] = pages.booking_page(
+            action=page,
+            view_state=portal.new_view_state(page),
+            field_type=field_type,
+            grid=portal.grids[field_type][""],
+            course_options=["Select a course", COURSE_NAMES[field_type]] if field_type in COURSE_NAMES else None,
+            course_idx=1,
+            test_name=THEORY_TEST_NAMES.get(field_type)
+        )
+
+    return fixtures
+
+
+def load_fixtures(days: int, slots_per_day: int, record: bool = False) -> Dict[str, str]:
+    """Loads the saved pages for a grid size, rendering and saving them first if missing (or if record is set).
+
+    Pages saved from the real portal can be dropped into the same directory as <page>.html to replay them instead.
+    """
+    directory = get_fixture_directory(days, slots_per_day)
+    if record or not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+        for page, html in render_fixtures(days, slots_per_day).items():
+            with open(os.path.join(directory, f"{page}.html"), "w", encoding="utf-8") as fixture_file:
+                fixture_file.write(html)
+
+    fixtures = {}
+    for filename in os.listdir(directory):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as fixture_file:
+                fixtures[filename[:-len(".html")]] = fixture_file.read()
+
+    return fixtures
@@ -0,0 +1,141 @@
+from collections import Counter
+from typing import Dict
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import NoAlertPresentException, NoSuchElementException
+from selenium.webdriver.common.by import By
+
+from src.utils.common import selenium_common
+from src.utils.parsers.aspnet_page import parse_aspnet_page
+
+
+class ReplayElement:
+    def __init__(self, driver: "ReplayDriver", element_id: str, element: Dict, option_idx: int = None):
+        self.driver = driver
+        self.element_id = element_id
+        self.element = element
+        self.option_idx = option_idx
+
+    @property
+    def tag_name(self):
+        self.driver.count("tag_name")
+        return "option" if self.option_idx is not None else self.element["tag"]
+
+    @property
+    def text(self):
+        self.driver.count("text")
+        if self.option_idx is not None:
+            return self.driver.page.selects[self.element_id]["options"][self.option_idx][1]
+        return self.driver.page.get_text(self.element_id)
+
+    def get_attribute(self, name: str):
+        self.driver.count("get_attribute")
+        if self.option_idx is not None:
+            return str(self.option_idx) if name == "index" else None
+        return self.element["attrs"].get(name)
+
+    def get_dom_attribute(self, name: str):
+        return self.get_attribute(name)
+
+    def find_elements(self, by: str, value: str):
+        self.driver.count("find_elements")
+        if by == By.TAG_NAME and value == "option" and self.element_id in self.driver.page.selects:
+            options = self.driver.page.selects[self.element_id]["options"]
+            return [ReplayElement(self.driver, self.element_id, self.element, idx) for idx in range(len(options))]
+        return []
+
+    def is_displayed(self):
+        self.driver.count("is_displayed")
+        return "display:none" not in self.element["attrs"].get("style", "").replace(" ", "")
+
+    def is_enabled(self):
+        self.driver.count("is_enabled")
+        return True
+
+    def is_selected(self):
+        self.driver.count("is_selected")
+        return False
+
+    def click(self):
+        self.driver.count("click")
+        # Slot buttons toggle between available and reserved, like a reservation postback without an alert would
+        src = self.element["attrs"].get("src") or ""
+        for image_name, toggled_name in (("Images1.gif", "Images2.gif"), ("Images2.gif", "Images1.gif")):
+            if src.endswith(image_name):
+                self.element["attrs"]["src"] = src[:-len(image_name)] + toggled_name
+                break
+
+    def send_keys(self, *keys):
+        self.driver.count("send_keys")
+
+
+class ReplaySwitchTo:
+    def __init__(self, driver: "ReplayDriver"):
+        self.driver = driver
+
+    @property
+    def alert(self):
+        self.driver.count("switch_to.alert")
+        raise NoAlertPresentException()
+
+
+class ReplayDriver:
+    """Stands in for a WebDriver, serving saved pages and counting every call that would be a round trip."""
+
+    def __init__(self, fixtures: Dict[str, str], base_url: str):
+        self.fixtures = fixtures
+        self.current_url = base_url
+        self.title = "Booking Portal"
+        self.page = parse_aspnet_page("", base_url)
+        self.round_trips = Counter()
+        self.switch_to = ReplaySwitchTo(self)
+
+    def count(self, call: str):
+        self.round_trips[call] += 1
+
+    def get(self, url: str):
+        self.count("get")
+        self.current_url = url
+        page_name = urlparse(url).path.rsplit("/", 1)[-1]
+        self.page = parse_aspnet_page(self.fixtures.get(page_name, ""), url)
+
+    @property
+    def page_source(self):
+        self.count("page_source")
+        return self.page.html
+
+    def execute_script(self, script: str, *args):
+        self.count("execute_script")
+        if script == selenium_common.PAGE_READY_SCRIPT:
+            return True
+        if script == selenium_common.KEEP_ALIVE_SCRIPT:
+            return [200, args[0], 0]
+        if script == selenium_common.IMAGE_SRC_SCRIPT:
+            return self.page.get_attribute(args[0], "src")
+        if script == selenium_common.PROBE_ELEMS_SCRIPT:
+            return {element_id: "display:none" not in (self.page.get_attribute(element_id, "style") or "").replace(
+                " ", "") for element_id in args[0] if self.page.has_element(element_id)}
+
+        # The grid and Dashboard scripts return table markup, the parsers pick their tables out of the whole page
+        return self.page.html
+
+    def find_element(self, by: str, value: str):
+        self.count("find_element")
+        if by == By.ID and self.page.has_element(value):
+            return ReplayElement(self, value, self.page.elements[value])
+        raise NoSuchElementException(f"{by}={value}")
+
+    def find_elements(self, by: str, value: str):
+        self.count("find_elements")
+        if by == By.ID and self.page.has_element(value):
+            return [ReplayElement(self, value, self.page.elements[value])]
+        return []
+
+    def set_window_size(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
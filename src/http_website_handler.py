@@ -0,0 +1,200 @@
+import time
+from typing import Dict, List, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.parsers.aspnet_page import AspNetPage, parse_aspnet_page
+from src.utils.parsers.dashboard import BOOKED_TABLE_ID, RESERVED_TABLE_ID
+from src.utils.parsers.html_table import extract_table_html
+from src.utils.parsers.slot_grid import SLOT_GRID_TABLE_ID
+from src.website_handler import CAPTCHA_IMG_ID, KEEP_ALIVE_PAGE, handler
+
+REQUEST_TIMEOUT = 30
+
+
+class PostbackSelect:
+    """Stands in for selenium's Select: choosing an option submits the AutoPostBack the dropdown would trigger."""
+
+    def __init__(self, cdc_handler: "http_handler", element_id: str):
+        self.cdc_handler = cdc_handler
+        self.element_id = element_id
+
+    def select_by_index(self, option_idx: int):
+        page = self.cdc_handler.page
+        select = page.selects[self.element_id]
+        option_value, option_text = select["options"][option_idx]
+
+        self.cdc_handler._postback(
+            event_target=select["name"],
+            extra_fields={select["name"]: option_value if option_value is not None else option_text}
+        )
+
+
+class http_handler(handler):
+    """Talks to the booking portal over a pooled requests.Session, the browser is only used to log in."""
+
+    def _start_driver(self, browser_type: str, headless: bool):
+        self.browser_type = browser_type
+        self.page = AspNetPage("", "")
+        self.pending_alerts = []
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        return None
+
+    def __exit__(self, *args):
+        self.session.close()
+
+    def _load_page(self, response: requests.Response):
+        self.page = parse_aspnet_page(response.text, response.url)
+        self.pending_alerts = list(self.page.alerts)
+        self.page_ready_at = time.perf_counter()
+
+    def _open_index(self, path: str, ready_ids: tuple = ()):
+        # A fetched page is complete as soon as its response is in
+        with self.page_latency.measure(path.split("?")[0].rsplit("/", 1)[-1]):
+            self._load_page(self.session.get(f"{self.booking_url}{self.port}/{path}", timeout=REQUEST_TIMEOUT))
+
+    def wait_for_page_ready(self, page_name: str, ready_ids: tuple = ()):
+        return True
+
+    def _postback(self, event_target: str = "", extra_fields: Union[Dict, None] = None,
+                  submit_id: Union[str, None] = None):
+        form_data = self.page.get_postback_data(event_target, extra_fields, submit_id)
+        self._load_page(self.session.post(self.page.get_postback_url(), data=form_data, timeout=REQUEST_TIMEOUT))
+
+    def get_current_url(self):
+        return self.page.url
+
+    def ping_session(self):
+        # Redirects are not followed, an expired session answers with one to the login page
+        try:
+            response = self.session.head(f"{self.booking_url}{self.port}/{KEEP_ALIVE_PAGE}", allow_redirects=False,
+                                         timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            return None, 0
+        header_bytes = sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+        return response.status_code == 200, header_bytes
+
+    def get_page_state(self) -> AspNetPage:
+        return self.page
+
+    def get_session_identity(self):
+        return [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path}
+                for cookie in self.session.cookies], self.session.headers.get("User-Agent", "")
+
+    def dismiss_alert(self, timeout: int = 2):
+        if self.pending_alerts:
+            return True, self.pending_alerts.pop(0)
+
+        return False, "No alert present"
+
+    def probe_elems(self, element_ids: List[str]) -> Dict[str, bool]:
+        return {element_id: "display:none" not in (self.page.get_attribute(element_id, "style") or "").replace(" ", "")
+                for element_id in element_ids if self.page.has_element(element_id)}
+
+    def get_elem_text(self, element_id: str):
+        return self.page.get_text(element_id)
+
+    def click_slot(self, element_id: str):
+        # Image buttons post their click coordinates along with the form
+        element_name = self.page.get_name(element_id)
+        self._postback(extra_fields={f"{element_name}.x": "10", f"{element_name}.y": "10"})
+
+    def confirm_slot_click(self, element_id: str, expected_state: str, timeout: int = 10):
+        # The postback response is already in, any alert it raised is pending
+        return self.dismiss_alert()
+
+    def dismiss_normal_captcha(self, caller_identifier: str, solve_captcha: bool = False,
+                               secondary_alert_timeout: int = 5, force_enabled: bool = False):
+        captcha_src = self.page.get_attribute(CAPTCHA_IMG_ID, "src")
+        if not captcha_src:
+            return True
+
+        # Closing the captcha pop-up is purely client-side, the page content is already there
+        if solve_captcha:
+            success, _, code = self.captcha_solver.solve_image(captcha_src.split(",", 1)[-1], page_url=self.page.url,
+                                                               force_enable=force_enabled)
+            if not success:
+                return False
+
+            self._postback(extra_fields={self.page.get_name("ctl00_ContentPlaceHolder1_txtVerificationCode"): code},
+                           submit_id="ctl00_ContentPlaceHolder1_Button1")
+
+        _, alert_text = self.dismiss_alert()
+        if solve_captcha:
+            self.captcha_solver.report_captcha_result(correct="incorrect captcha" not in alert_text)
+        if "incorrect captcha" in alert_text:
+            self.dismiss_alert()
+            self.log.info(f"Normal captcha failed for opening {caller_identifier} page.")
+            return False
+
+        return True
+
+    def accept_terms_and_conditions(self):
+        terms_checkbox_id = "ctl00_ContentPlaceHolder1_chkTermsAndCond"
+        agree_btn_id = "ctl00_ContentPlaceHolder1_btnAgreeTerms"
+        if self.page.has_element(terms_checkbox_id) and self.page.has_element(agree_btn_id):
+            self._postback(extra_fields={self.page.get_name(terms_checkbox_id): "on"}, submit_id=agree_btn_id)
+
+    def get_course_data(self, course_element_id: Union[str, None] = None):
+        course_element_id = course_element_id or "ctl00_ContentPlaceHolder1_ddlCourse"
+        select = self.page.selects.get(course_element_id)
+        if not select:
+            return False
+
+        return {
+            "course_selection": PostbackSelect(self, course_element_id),
+            "available_courses": [str(option_text.strip()) for _, option_text in select["options"]]
+        }
+
+    def open_home_page(self):
+        response = self.session.get(self.home_url, timeout=REQUEST_TIMEOUT)
+        assert "ComfortDelGro" in response.text
+
+    def account_login(self):
+        # reCAPTCHA v2 needs a real browser, the authenticated cookies are then handed over to the session. The
+        # browser is quit once they are, unless keep_login_browser trades its memory for faster re-logins
+        browser_config = dict(self.browser_config, engine="selenium")
+        keep_browser = self.browser_config.get("keep_login_browser", False)
+        with handler(
+                login_credentials={"username": self.username, "password": self.password},
+                captcha_solver=self.captcha_solver,
+                log=self.log,
+                notification_manager=self.notification_manager,
+                browser_config=browser_config,
+                program_config=self.program_config,
+                driver_manager=self.driver_manager if keep_browser else None
+        ) as browser_handler:
+            browser_handler.login_latency = self.login_latency
+            if not browser_handler.account_login():
+                return False
+
+            self.load_driver_session(browser_handler.driver)
+            self.port = browser_handler.port
+
+        self.logged_in = True
+        self.save_session()
+        self.log.info("Logged in, session handed over to the HTTP engine.")
+        return True
+
+    def restore_session(self, session: Dict):
+        self.session.headers.update({"User-Agent": session["user_agent"]})
+        for cookie in session["cookies"]:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"),
+                                     path=cookie.get("path", "/"))
+
+    def load_driver_session(self, driver):
+        self.restore_session({"cookies": driver.get_cookies(),
+                              "user_agent": driver.execute_script("return navigator.userAgent;")})
+
+    def fetch_dashboard_html(self):
+        return "".join(extract_table_html(self.page.html, table_id)
+                       for table_id in (BOOKED_TABLE_ID, RESERVED_TABLE_ID))
+
+    def fetch_slot_grid_html(self):
+        return extract_table_html(self.page.html, SLOT_GRID_TABLE_ID)
@@ -5,13 +5,21 @@ import time
 
 sys.path.insert(0, os.getcwd())
 
+from src.http_website_handler import http_handler
 from src.website_handler import handler
 
 from src.utils.common import utils
+from src.utils.driver_manager import DriverManager
 from src.utils.log import Log
 from src.utils.captcha.two_captcha import Captcha as TwoCaptcha
 from src.utils.notifications.notification_manager import NotificationManager
 
+RECAPTCHA_PREFETCH_LEAD = 60
+# Restart delays (in seconds): an error with the session still logged in is retried soon, backing off while errors
+# repeat, while failed logins and finished one-shot runs wait the full hour
+RESTART_DELAY = 60
+MAX_RESTART_DELAY = 3600
+
 if __name__ == "__main__":
     config = utils.load_config_from_yaml_file(file_path="config.yaml")
     program_config = config["program_config"]
@@ -21,22 +29,26 @@ if __name__ == "__main__":
     notification_manager = NotificationManager(log=log, mail_config=config["mail_config"],
                                                telegram_config=config["telegram_config"])
 
-    if not os.path.exists("temp"):
-        os.makedirs("temp")
-    else:
-        utils.clear_directory("temp", log)
+    handler_class = http_handler if config["browser_config"].get("engine") == "http" else handler
+    # One browser is kept warm across restarts, every handler borrows it instead of starting its own (the http
+    # engine only when keep_login_browser is set)
+    driver_manager = DriverManager(browser_config=config["browser_config"], log=log)
+    failed_restarts = 0
 
     while True:
-        with handler(
+        stopped_by_user = False
+        failed = False
+        with handler_class(
                 login_credentials=config["cdc_login_credentials"],
                 captcha_solver=captcha_solver,
                 log=log,
                 notification_manager=notification_manager,
                 browser_config=config["browser_config"],
-                program_config=program_config
+                program_config=program_config,
+                driver_manager=driver_manager
         ) as cdc_handler:
 
-            success_logging_in = cdc_handler.account_login()
+            success_logging_in = cdc_handler.resume_session() or cdc_handler.account_login()
             monitored_types = program_config["monitored_types"]
 
             try:
@@ -47,12 +59,21 @@ if __name__ == "__main__":
 
                     for monitor_type, monitor_active in monitored_types.items():
                         if monitor_active and cdc_handler.open_field_type_booking_page(field_type=monitor_type):
+                            if cdc_handler.is_grid_unchanged(field_type=monitor_type):
+                                continue
+
                             cdc_handler.get_all_session_date_times(field_type=monitor_type)
                             cdc_handler.get_all_available_sessions(field_type=monitor_type)
                             cdc_handler.check_if_earlier_available_sessions(field_type=monitor_type)
 
                     log.info(cdc_handler)
+                    log.info(f"Page load latencies:\n{cdc_handler.page_latency}")
+                    log.info(f"Slot click confirmation latencies:\n{cdc_handler.click_latency}")
+                    log.info(f"Session keep-alive:\n{cdc_handler.keep_alive}")
+                    log.info(f"Login reCAPTCHA:\n{cdc_handler.login_latency}")
+                    log.info(f"Captcha solves:\n{captcha_solver.metrics}")
                     cdc_handler.flush_notification_update()
+                    failed_restarts = 0
 
                     if program_config["refresh_rate"] > 0:
                         refresh_rate = program_config["refresh_rate"]
@@ -69,37 +90,52 @@ if __name__ == "__main__":
                         cdc_handler.log.info(
                             f"Program now sleeping for {sleep_duration} till {current_time + sleep_duration}...")
 
-                        sleep_duration = sleep_duration.total_seconds()
-                        if sleep_duration > 60:
-                            for i in range(int(sleep_duration / 60)):
-                                cdc_handler.check_logged_in()
-                                time.sleep(60)
-                            time.sleep(sleep_duration % 60)
-                        else:
-                            time.sleep(sleep_duration)
+                        # Keeps the session alive with cheap pings, paced from the portal's observed session timeout
+                        sleep_until = time.time() + sleep_duration.total_seconds()
+                        while sleep_until - time.time() > cdc_handler.keep_alive.interval:
+                            time.sleep(cdc_handler.keep_alive.interval)
+                            cdc_handler.check_logged_in()
+                        time.sleep(max(sleep_until - time.time(), 0))
 
                         cdc_handler.log.info(f"Program now resuming! Cached log in ?: {cdc_handler.logged_in}")
                     else:
                         break
             except KeyboardInterrupt:
                 log.info("Program stopped by user.")
+                stopped_by_user = True
             except Exception as e:
                 log.error(f"Program encountered an error: {e}")
                 notification_manager.send_notification_all(title="", msg=f"Program encountered an error: {e}")
+                failed = True
             finally:
-                cdc_handler.account_logout()
-                # cdc_handler.driver.quit()
-
-                if not program_config["auto_restart"]:
+                # The session is left logged in and stored, the next start (or restart) resumes it instead of solving
+                # another reCAPTCHA. resume_session drops it if the portal no longer takes it
+                if stopped_by_user or not program_config["auto_restart"]:
+                    if program_config.get("logout_on_exit"):
+                        cdc_handler.account_logout()
                     break
 
-                sleep_duration = datetime.timedelta(hours=1)
+                if failed and cdc_handler.logged_in:
+                    sleep_duration = datetime.timedelta(
+                        seconds=min(RESTART_DELAY * 2 ** failed_restarts, MAX_RESTART_DELAY))
+                    failed_restarts += 1
+                else:
+                    sleep_duration = datetime.timedelta(seconds=MAX_RESTART_DELAY)
+
                 message = f"Program restarting in {sleep_duration} at {datetime.datetime.now() + sleep_duration}..."
                 notification_manager.send_notification_all(title="", msg=message)
                 log.info(message +
                          "\n# ------------------------------------- - ------------------------------------ #\n\n")
-                time.sleep(sleep_duration.total_seconds())
+                if cdc_handler.logged_in:
+                    time.sleep(sleep_duration.total_seconds())
+                    continue
+
+                # A full login is due, its reCAPTCHA is solved during the last minute of the wait
+                time.sleep(max(sleep_duration.total_seconds() - RECAPTCHA_PREFETCH_LEAD, 0))
+                captcha_solver.prefetch_recaptcha()
+                time.sleep(min(sleep_duration.total_seconds(), RECAPTCHA_PREFETCH_LEAD))
                 continue
 
+    driver_manager.close()
     log.info("Program exited.")
     notification_manager.send_notification_all(title="", msg="Program exited.")
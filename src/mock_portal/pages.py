@@ -0,0 +1,160 @@
+import base64
+from html import escape
+from typing import Dict, List, Union
+
+from src.mock_portal.scenario import CellState, SlotGridState
+
+CONTENT_ID = "ctl00_ContentPlaceHolder1"
+CONTENT_NAME = "ctl00$ContentPlaceHolder1"
+
+POSTBACK_SCRIPT = """<script type="text/javascript">
+var theForm = document.forms['aspnetForm'];
+function __doPostBack(eventTarget, eventArgument) {
+    theForm.__EVENTTARGET.value = eventTarget;
+    theForm.__EVENTARGUMENT.value = eventArgument;
+    theForm.submit();
+}
+</script>"""
+
+
+def alert_scripts(alerts: List[str]):
+    return "".join("<script type=\"text/javascript\">alert('{}');</script>".format(alert.replace("'", "\\'"))
+                   for alert in alerts)
+
+
+def captcha_image_src(code: str):
+    return "data:image/jpeg;base64," + base64.b64encode(f"MOCKCAPTCHA:{code}".encode()).decode()
+
+
+def read_captcha_image_src(src: str):
+    return base64.b64decode(src[23:]).decode().split(":", 1)[-1]
+
+
+def layout(title: str, body: str, alerts: Union[List[str], None] = None):
+    return (f"<!DOCTYPE html><html><head><title>{escape(title)}</title></head>"
+            f"<body>{body}{alert_scripts(alerts or [])}</body></html>")
+
+
+def home_page(alerts: Union[List[str], None] = None):
+    menu_items = "".join(f"<li><a href=\"#\">Menu {idx}</a></li>" for idx in range(1, 10))
+    body = f"""
+<div id="top-menu"><ul>{menu_items}
+<li><a href="#" onclick="document.getElementById('login-box').style.display='block'; return false;">Login</a></li>
+</ul></div>
+<div id="login-box" style="display:none">
+<form method="post" action="/Login">
+<input type="text" name="userId" />
+<input type="password" name="password" />
+<div class="g-recaptcha" data-sitekey="mock-site-key"></div>
+<textarea name="g-recaptcha-response" style="display:none"></textarea>
+<input type="submit" id="BTNSERVICE2" value="Login" />
+</form>
+</div>"""
+    return layout("ComfortDelGro Driving Centre", body, alerts)
+
+
+def aspnet_form(action: str, view_state: str, body: str, alerts: Union[List[str], None] = None):
+    form = f"""<form method="post" action="./{action}" id="aspnetForm">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{view_state}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{view_state[::-1]}" />
+{POSTBACK_SCRIPT}
+{body}
+<div id="{CONTENT_ID}_UpdateProgress1" style="display:none">Loading...</div>
+</form>"""
+    return layout("Booking Portal", form, alerts)
+
+
+def select_html(control: str, options: List[str], selected_idx: int = 0):
+    selected_attr = " selected=\"selected\""
+    option_tags = "".join(
+        f"<option value=\"{escape(option)}\"{selected_attr if idx == selected_idx else ''}>{escape(option)}</option>"
+        for idx, option in enumerate(options))
+    return (f"<select name=\"{CONTENT_NAME}${control}\" id=\"{CONTENT_ID}_{control}\" "
+            f"onchange=\"javascript:setTimeout('__doPostBack(\\'{CONTENT_NAME}${control}\\',\\'\\')', 0)\">"
+            f"{option_tags}</select>")
+
+
+def captcha_html(code: str):
+    return f"""<div id="captcha-modal">
+<button type="button" class="close" onclick="document.getElementById('captcha-modal').style.display='none'">x</button>
+<img id="{CONTENT_ID}_CaptchaImg" src="{captcha_image_src(code)}" />
+<input type="text" name="{CONTENT_NAME}$txtVerificationCode" id="{CONTENT_ID}_txtVerificationCode" />
+<input type="submit" name="{CONTENT_NAME}$Button1" id="{CONTENT_ID}_Button1" value="Submit" />
+</div>"""
+
+
+def terms_html():
+    return f"""<div id="terms">
+<input type="checkbox" name="{CONTENT_NAME}$chkTermsAndCond" id="{CONTENT_ID}_chkTermsAndCond" />
+<input type="submit" name="{CONTENT_NAME}$btnAgreeTerms" id="{CONTENT_ID}_btnAgreeTerms" value="I Agree" />
+</div>"""
+
+
+def slot_grid_html(grid: SlotGridState):
+    header = "<tr><th>Date</th><th>Day</th>" + "".join(
+        f"<th>Session {idx + 1}<br />{time_slot}</th>" for idx, time_slot in enumerate(grid.time_slots)) + "</tr>"
+
+    rows = []
+    for row_idx, (date, row) in enumerate(zip(grid.dates, grid.cells)):
+        row_ctl = f"ctl{row_idx + 2:02d}"
+        cells = []
+        for column, state in enumerate(row):
+            if state is CellState.FULL:
+                cells.append("<td></td>")
+                continue
+
+            button = f"btnSession{grid.get_button_number(column)}"
+            cells.append(
+                f"<td><input type=\"image\" name=\"{CONTENT_NAME}$gvLatestav${row_ctl}${button}\" "
+                f"id=\"{CONTENT_ID}_gvLatestav_{row_ctl}_{button}\" src=\"../../Images/{state}\" /></td>")
+        rows.append(f"<tr><td>{date:%d/%b/%Y}</td><td>{date:%a}</td>{''.join(cells)}</tr>")
+
+    return f"<table id=\"{CONTENT_ID}_gvLatestav\">{header}{''.join(rows)}</table>"
+
+
+def booking_page(action: str, view_state: str, field_type: str, grid: SlotGridState,
+                 course_options: Union[List[str], None] = None, course_idx: int = 0,
+                 team_options: Union[List[str], None] = None, team_idx: int = 0,
+                 captcha_code: Union[str, None] = None, show_terms: bool = False, show_grid: bool = True,
+                 test_name: Union[str, None] = None, alerts: Union[List[str], None] = None):
+    body = ""
+
+    if course_options:
+        body += select_html("ddlCourse", course_options, course_idx)
+    if team_options:
+        body += select_html("ddlOthTeamID", team_options, team_idx)
+    if test_name:
+        body += f"<span id=\"{CONTENT_ID}_lblResAsmBlyDesc\">{escape(test_name)}</span>"
+    if captcha_code:
+        body += captcha_html(captcha_code)
+    if show_terms:
+        body += terms_html()
+
+    if show_grid:
+        if grid.has_open_slots():
+            body += slot_grid_html(grid)
+        else:
+            body += (f"<span id=\"{CONTENT_ID}_lblFullBookMsg\">"
+                     f"All {field_type.upper()} sessions are fully booked.</span>")
+
+    return aspnet_form(action, view_state, body, alerts)
+
+
+def lesson_table_html(table: str, lessons: List[Dict]):
+    rows = "".join(
+        f"<tr><td>{lesson['date']:%d/%b/%Y}</td><td>{lesson['date']:%a}</td>"
+        f"<td>{lesson['start']}:00</td><td>{lesson['end']}:00</td><td>{escape(lesson['name'])}</td></tr>"
+        for lesson in lessons)
+    return (f"<table id=\"{CONTENT_ID}_{table}\"><tr><th>Date</th><th>Day</th><th>Start</th><th>End</th>"
+            f"<th>Lesson</th></tr>{rows}</table>")
+
+
+def dashboard_page(view_state: str, booked: List[Dict], reserved: List[Dict]):
+    body = lesson_table_html("gvBooked", booked) + lesson_table_html("gvReserved", reserved)
+    return aspnet_form("Dashboard.aspx", view_state, body)
+
+
+def simple_page(title: str, text: str):
+    return layout(title, f"<div id=\"{CONTENT_ID}_lblMessage\">{escape(text)}</div>")
@@ -0,0 +1,266 @@
+import base64
+import random
+import string
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+from abstracts.cdc_abstract import Types
+from src.mock_portal import pages
+from src.mock_portal.scenario import COURSE_NAMES, THEORY_TEST_NAMES, CellState, Scenario, SlotGridState
+
+SESSION_COOKIE = "ASP.NET_SessionId"
+
+BOOKING_PAGES = {
+    "BookingPL.aspx": Types.PRACTICAL,
+    "BookingSimulator.aspx": Types.SIMULATOR,
+    "BookingTT.aspx": None,  # whichever theory test the scenario offers
+    "BookingPT.aspx": Types.PT,
+}
+
+# 1x1 transparent gif for the slot images
+SLOT_IMAGE = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+ALERT_BACK_TO_BACK = "Back to Back session is not allowed"
+ALERT_MAX_RESERVED = "You have exceeded the maximum number of sessions allowed for reservation."
+ALERT_INCORRECT_CAPTCHA = "You have entered an incorrect captcha."
+ALERT_CAPTCHA_RETRY = "Please try again."
+ALERT_COMPLETE_CAPTCHA = "Please complete the captcha."
+
+Response = Tuple[int, List[Tuple[str, str]], Union[str, bytes]]
+
+
+class PageState:
+    def __init__(self):
+        self.course_idx = 0
+        self.team_idx = 0
+        self.captcha_code = None
+        self.captcha_passed = False
+
+
+class PortalSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.last_seen = time.time()
+        self.pages: Dict[str, PageState] = {}
+        self.terms_accepted = set()
+
+
+class MockPortal:
+    """In-memory state of the mocked CDC portal, shared by the home page and booking portal servers."""
+
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.grids = scenario.build_grids()
+        self.sessions: Dict[str, PortalSession] = {}
+        self.lock = threading.Lock()
+        self.rng = random.Random(scenario.seed)
+
+        self.home_url = ""
+        self.booking_base_url = ""
+        self.request_count = 0
+        self.view_state_counter = 0
+
+    def get_session(self, session_id: Union[str, None]):
+        session = self.sessions.get(session_id)
+        if session and time.time() - session.last_seen > self.scenario.session_timeout:
+            del self.sessions[session_id]
+            return None
+
+        if session:
+            session.last_seen = time.time()
+        return session
+
+    def expire_sessions(self):
+        self.sessions.clear()
+
+    def new_code(self, length: int):
+        return "".join(self.rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+    def new_view_state(self, page: str):
+        self.view_state_counter += 1
+        return base64.b64encode(f"{page}:{self.view_state_counter}".encode()).decode()
+
+    def handle_home(self, method: str, path: str, session_id: Union[str, None], form: Dict) -> Response:
+        with self.lock:
+            self.request_count += 1
+
+            if path.startswith("/Login") and method == "POST":
+                if self.scenario.captcha_mode == "strict" and not form.get("g-recaptcha-response"):
+                    return 200, [], pages.home_page(alerts=[ALERT_COMPLETE_CAPTCHA])
+
+                session = PortalSession(self.new_code(24))
+                self.sessions[session.session_id] = session
+                return 302, [("Location", f"{self.booking_base_url}/NewPortal/Booking/Dashboard.aspx"),
+                             ("Set-Cookie", f"{SESSION_COOKIE}={session.session_id}; Path=/")], ""
+
+            return 200, [], pages.home_page()
+
+    def handle_booking(self, method: str, path: str, session_id: Union[str, None], form: Dict) -> Response:
+        with self.lock:
+            self.request_count += 1
+            page = path.split("?")[0].rsplit("/", 1)[-1]
+
+            if page.startswith("Images"):
+                return 200, [("Content-Type", "image/gif")], SLOT_IMAGE
+
+            session = self.get_session(session_id)
+            if page == "logOut.aspx":
+                self.sessions.pop(session_id, None)
+                return 302, [("Location", self.home_url)], ""
+
+            if not session:
+                return 302, [("Location", self.home_url)], ""
+
+            if page == "Dashboard.aspx":
+                booked, reserved = self.get_lessons()
+                return 200, [], pages.dashboard_page(self.new_view_state(page), booked, reserved)
+
+            if page == "StatementBooking.aspx":
+                return 200, [], pages.simple_page("Statement", "Booking statement")
+
+            if page == "Alert.aspx":
+                return 200, [], pages.simple_page("Alert", "You do not have access to this page.")
+
+            if page in BOOKING_PAGES:
+                return self.handle_booking_page(session, page, method, form)
+
+            return 404, [], pages.simple_page("Not Found", path)
+
+    def handle_booking_page(self, session: PortalSession, page: str, method: str, form: Dict) -> Response:
+        field_type = BOOKING_PAGES[page] or self.scenario.theory_test
+        if field_type in self.scenario.no_access:
+            return 302, [("Location", f"{self.booking_base_url}/NewPortal/Booking/Alert.aspx")], ""
+
+        needs_course = field_type in COURSE_NAMES
+        course_options = ["Select a course", COURSE_NAMES[field_type]] if needs_course else None
+        team_options = (["Select a team"] + self.scenario.teams
+                        if field_type == Types.PRACTICAL and self.scenario.teams else None)
+
+        state = session.pages.get(page)
+        if method == "GET" or state is None:
+            state = PageState()
+            session.pages[page] = state
+            if not needs_course:
+                state.captcha_code = self.new_code(6)
+
+        alerts = []
+        if method == "POST":
+            alerts = self.handle_postback(session, page, field_type, state, form, course_options, team_options)
+
+        grid = self.get_grid(field_type, state)
+        show_grid = state.captcha_passed if (needs_course or field_type == Types.PT) else True
+
+        return 200, [], pages.booking_page(
+            action=page,
+            view_state=self.new_view_state(page),
+            field_type=field_type,
+            grid=grid,
+            course_options=course_options,
+            course_idx=state.course_idx,
+            team_options=team_options if state.captcha_passed else None,
+            team_idx=state.team_idx,
+            captcha_code=None if state.captcha_passed else state.captcha_code,
+            show_terms=not needs_course and page not in session.terms_accepted,
+            show_grid=show_grid,
+            test_name=THEORY_TEST_NAMES.get(field_type),
+            alerts=alerts
+        )
+
+    def handle_postback(self, session: PortalSession, page: str, field_type: str, state: PageState, form: Dict,
+                        course_options: Union[List[str], None], team_options: Union[List[str], None]):
+        event_target = form.get("__EVENTTARGET", "")
+
+        # Posted control values win over the session, as in WebForms, so concurrent team postbacks don't leak
+        team_field = next((key for key in form if key.endswith("$ddlOthTeamID")), None)
+        if team_field and team_options:
+            state.team_idx = team_options.index(form[team_field]) if form[team_field] in team_options else 0
+
+        if event_target.endswith("ddlCourse") and course_options:
+            selected = form.get(event_target, "")
+            state.course_idx = course_options.index(selected) if selected in course_options else 0
+            state.captcha_code = self.new_code(6) if state.course_idx > 0 else None
+            state.captcha_passed = False
+            return []
+
+        if event_target.endswith("ddlOthTeamID") and team_options:
+            selected = form.get(event_target, "")
+            state.team_idx = team_options.index(selected) if selected in team_options else 0
+            return []
+
+        if any(key.endswith("$Button1") for key in form):
+            code = next((value for key, value in form.items() if key.endswith("$txtVerificationCode")), "")
+            if self.scenario.captcha_mode == "strict" and code != state.captcha_code:
+                state.captcha_code = self.new_code(6)
+                return [ALERT_INCORRECT_CAPTCHA, ALERT_CAPTCHA_RETRY]
+
+            state.captcha_passed = True
+            return []
+
+        if any(key.endswith("$btnAgreeTerms") for key in form):
+            if any(key.endswith("$chkTermsAndCond") for key in form):
+                session.terms_accepted.add(page)
+            return []
+
+        for key in form:
+            if "$gvLatestav$" in key and key.endswith(".x"):
+                # e.g. ctl00$ContentPlaceHolder1$gvLatestav$ctl02$btnSession4.x
+                row_ctl, button = key[:-2].split("$")[-2:]
+                grid = self.get_grid(field_type, state)
+                return self.toggle_reservation(field_type, grid, int(row_ctl[3:]) - 2,
+                                               grid.get_column(int(button[10:])))
+
+        return []
+
+    def get_grid(self, field_type: str, state: PageState) -> SlotGridState:
+        field_type_grids = self.grids[field_type]
+        if state.team_idx > 0 and state.team_idx <= len(self.scenario.teams):
+            return field_type_grids[self.scenario.teams[state.team_idx - 1]]
+        return field_type_grids[""]
+
+    def toggle_reservation(self, field_type: str, grid: SlotGridState, row: int, column: int):
+        if not (0 <= row < len(grid.cells) and 0 <= column < len(grid.time_slots)):
+            return []
+
+        cell_state = grid.cells[row][column]
+        if cell_state == CellState.RESERVED:
+            grid.cells[row][column] = CellState.AVAILABLE
+            return []
+
+        if cell_state != CellState.AVAILABLE:
+            return []
+
+        if field_type in self.scenario.cannot_book:
+            return [self.scenario.cannot_book[field_type]]
+
+        reserved_count = sum(field_grid.count(CellState.RESERVED) for field_grid in self.grids[field_type].values())
+        if reserved_count >= self.scenario.max_reservations[field_type]:
+            return [ALERT_MAX_RESERVED]
+
+        if field_type == Types.SIMULATOR:
+            for neighbour in (column - 1, column + 1):
+                if 0 <= neighbour < len(grid.time_slots) and \
+                        grid.cells[row][neighbour] in (CellState.RESERVED, CellState.BOOKED):
+                    return [ALERT_BACK_TO_BACK]
+
+        grid.cells[row][column] = CellState.RESERVED
+        return []
+
+    def get_lessons(self):
+        booked, reserved = [], []
+
+        for field_type, field_type_grids in self.grids.items():
+            lesson_idx = 1
+            for grid in field_type_grids.values():
+                for date, row in zip(grid.dates, grid.cells):
+                    for column, cell_state in enumerate(row):
+                        if cell_state not in (CellState.BOOKED, CellState.RESERVED):
+                            continue
+
+                        start, end = grid.time_slots[column].split(" - ")
+                        lesson = {"date": date, "start": start, "end": end,
+                                  "name": self.scenario.lesson_name(field_type, lesson_idx)}
+                        lesson_idx += 1
+                        (booked if cell_state == CellState.BOOKED else reserved).append(lesson)
+
+        return booked, reserved
@@ -0,0 +1,151 @@
+import datetime
+import random
+from typing import Dict, List, Union
+
+from abstracts.cdc_abstract import Types
+
+
+class CellState:
+    FULL = None  # no button rendered
+    AVAILABLE = "Images1.gif"
+    RESERVED = "Images2.gif"
+    BOOKED = "Images3.gif"
+
+
+DEFAULT_MAX_RESERVATIONS = {
+    Types.SIMULATOR: 3,
+    Types.PRACTICAL: 6,
+    Types.BTT: 1,
+    Types.RTT: 1,
+    Types.FTT: 1,
+    Types.PT: 1,
+}
+
+LESSON_NAMES = {
+    Types.SIMULATOR: "SIMULATOR MODULE {n}",
+    Types.PRACTICAL: "CLASS 3A AUTOCAR LESSON {n}",
+    Types.BTT: "BTT",
+    Types.RTT: "RTT",
+    Types.FTT: "FTT",
+    Types.PT: "CLASS 3A PT",
+}
+
+THEORY_TEST_NAMES = {
+    Types.BTT: "Basic Theory Test",
+    Types.RTT: "Riding Theory Test",
+    Types.FTT: "Final Theory Test",
+}
+
+COURSE_NAMES = {
+    Types.PRACTICAL: "Class 3A Motorcar",
+    Types.SIMULATOR: "Simulator Course - Car (School)",
+}
+
+# The simulator grid numbers its buttons two columns later than the header (see parse_slot_grid)
+BUTTON_COLUMN_OFFSET = {
+    Types.SIMULATOR: -2,
+}
+
+
+def get_time_slots(slots_per_day: int):
+    step = 90 if slots_per_day <= 11 else max(10, 990 // slots_per_day)
+    first_slot = datetime.datetime(2000, 1, 1, 7, 0)
+
+    time_slots = []
+    for slot_idx in range(slots_per_day):
+        start = first_slot + datetime.timedelta(minutes=slot_idx * step)
+        end = start + datetime.timedelta(minutes=step - 10)
+        time_slots.append(f"{start:%H:%M} - {end:%H:%M}")
+
+    return time_slots
+
+
+class SlotGridState:
+    """A days x session-columns grid of CellState values for one field type (and team)."""
+
+    def __init__(self, field_type: str, dates: List[datetime.date], time_slots: List[str],
+                 cells: List[List[Union[str, None]]]):
+        self.field_type = field_type
+        self.dates = dates
+        self.time_slots = time_slots
+        self.cells = cells
+
+    def has_button(self, column: int):
+        return self.get_button_number(column) > 0
+
+    def get_button_number(self, column: int):
+        return column + 1 + BUTTON_COLUMN_OFFSET.get(self.field_type, 0)
+
+    def get_column(self, button_number: int):
+        return button_number - 1 - BUTTON_COLUMN_OFFSET.get(self.field_type, 0)
+
+    def count(self, state: str):
+        return sum(row.count(state) for row in self.cells)
+
+    def has_open_slots(self):
+        return self.count(CellState.AVAILABLE) + self.count(CellState.RESERVED) > 0
+
+
+class Scenario:
+    """Deterministic portal content seeded from an integer, so a benchmark or test run is reproducible."""
+
+    def __init__(self, seed: int = 0, days: int = 30, slots_per_day: int = 10,
+                 start_date: Union[datetime.date, None] = None, availability: float = 0.1,
+                 booked_lessons: Union[Dict[str, int], None] = None, teams: Union[List[str], None] = None,
+                 theory_test: str = Types.BTT, no_access: Union[List[str], None] = None,
+                 max_reservations: Union[Dict[str, int], None] = None, captcha_mode: str = "accept",
+                 session_timeout: int = 20 * 60, cannot_book: Union[Dict[str, str], None] = None):
+        self.seed = seed
+        self.days = days
+        self.slots_per_day = slots_per_day
+        self.start_date = start_date or datetime.date(2026, 1, 5)
+        self.availability = availability
+        self.booked_lessons = booked_lessons if booked_lessons is not None else {Types.PRACTICAL: 1}
+        self.teams = teams or []
+        self.theory_test = theory_test
+        self.no_access = no_access or []
+        self.max_reservations = dict(DEFAULT_MAX_RESERVATIONS, **(max_reservations or {}))
+        self.captcha_mode = captcha_mode  # "accept" takes any answer, "strict" checks the code shown
+        self.session_timeout = session_timeout
+        self.cannot_book = cannot_book or {}  # field type -> alert shown when reserving
+
+        self.dates = [self.start_date + datetime.timedelta(days=day_idx) for day_idx in range(days)]
+        self.time_slots = get_time_slots(slots_per_day)
+
+    def build_grids(self) -> Dict[str, Dict[str, SlotGridState]]:
+        grids = {}
+        for field_type in [Types.SIMULATOR, Types.PRACTICAL, Types.PT, self.theory_test]:
+            grids[field_type] = {"": self.build_grid(field_type, self.seed)}
+
+        for team_idx, team in enumerate(self.teams):
+            grids[Types.PRACTICAL][team] = self.build_grid(Types.PRACTICAL, self.seed + team_idx + 1,
+                                                           with_booked=False)
+
+        return grids
+
+    def build_grid(self, field_type: str, seed: int, with_booked: bool = True):
+        rng = random.Random(f"{seed}:{field_type}")
+        time_slots = self.time_slots if field_type in [Types.PRACTICAL, Types.SIMULATOR] else self.time_slots[:4]
+        grid = SlotGridState(field_type, self.dates, time_slots, [])
+
+        for _ in self.dates:
+            row = []
+            for column in range(len(time_slots)):
+                if not grid.has_button(column):
+                    row.append(CellState.FULL)
+                else:
+                    row.append(CellState.AVAILABLE if rng.random() < self.availability else CellState.FULL)
+            grid.cells.append(row)
+
+        # The user's own booked lessons sit towards the end of the grid
+        booked_count = self.booked_lessons.get(field_type, 0) if with_booked else 0
+        button_columns = [column for column in range(len(time_slots)) if grid.has_button(column)]
+        for booked_idx in range(booked_count):
+            row_idx = len(self.dates) - 1 - (booked_idx * 2) % max(len(self.dates), 1)
+            column = button_columns[rng.randrange(len(button_columns))]
+            grid.cells[row_idx][column] = CellState.BOOKED
+
+        return grid
+
+    def lesson_name(self, field_type: str, lesson_idx: int = 1):
+        return LESSON_NAMES[field_type].format(n=lesson_idx)
@@ -0,0 +1,132 @@
+import argparse
+import os
+import sys
+import threading
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.getcwd())
+
+from src.mock_portal.portal import SESSION_COOKIE, MockPortal
+from src.mock_portal.scenario import Scenario
+
+
+def make_request_handler(handle: Callable):
+    class MockRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self, method: str, form: dict, send_body: bool = True):
+            cookies = SimpleCookie(self.headers.get("Cookie", ""))
+            session_id = cookies[SESSION_COOKIE].value if SESSION_COOKIE in cookies else None
+
+            status, headers, body = handle(method, self.path, session_id, form)
+            body = body.encode() if isinstance(body, str) else body
+
+            self.send_response(status)
+            if not any(header == "Content-Type" for header, _ in headers):
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+            for header, value in headers:
+                self.send_header(header, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond("GET", {})
+
+        def do_HEAD(self):
+            self._respond("GET", {}, send_body=False)
+
+        def do_POST(self):
+            content_length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(content_length).decode() if content_length else ""
+            self._respond("POST", dict(parse_qsl(body, keep_blank_values=True)))
+
+        def log_message(self, *args):
+            pass
+
+    return MockRequestHandler
+
+
+class MockPortalServer:
+    """Serves the mocked www.cdc.com.sg home page and booking portal on two local ports.
+
+    Point browser_config.home_url at home_url and browser_config.booking_url at booking_url; like the real portal,
+    the booking port is picked up from the url after logging in.
+    """
+
+    def __init__(self, scenario: Scenario, host: str = "127.0.0.1", home_port: int = 0, booking_port: int = 0):
+        self.portal = MockPortal(scenario)
+        self.host = host
+
+        self.home_server = ThreadingHTTPServer((host, home_port), make_request_handler(self.portal.handle_home))
+        self.booking_server = ThreadingHTTPServer((host, booking_port),
+                                                  make_request_handler(self.portal.handle_booking))
+        self.threads = []
+
+        self.portal.home_url = self.home_url
+        self.portal.booking_base_url = f"{self.booking_url}{self.booking_port}"
+
+    @property
+    def home_url(self):
+        return f"http://{self.host}:{self.home_server.server_address[1]}"
+
+    @property
+    def booking_url(self):
+        return f"http://{self.host}:"
+
+    @property
+    def booking_port(self):
+        return str(self.booking_server.server_address[1])
+
+    def start(self):
+        for server in (self.home_server, self.booking_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in (self.home_server, self.booking_server):
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the CDC booking portal.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--slots", type=int, default=10, help="Sessions per day")
+    parser.add_argument("--availability", type=float, default=0.1, help="Chance of a session being available")
+    parser.add_argument("--teams", default="", help="Comma separated OneTeam names to offer in ddlOthTeamID")
+    parser.add_argument("--theory-test", default="btt", choices=["btt", "rtt", "ftt"])
+    parser.add_argument("--captcha-mode", default="accept", choices=["accept", "strict"])
+    parser.add_argument("--session-timeout", type=int, default=20 * 60, help="Session timeout in seconds")
+    parser.add_argument("--home-port", type=int, default=8000)
+    parser.add_argument("--booking-port", type=int, default=8001)
+    args = parser.parse_args()
+
+    mock_scenario = Scenario(seed=args.seed, days=args.days, slots_per_day=args.slots,
+                             availability=args.availability, teams=[team for team in args.teams.split(",") if team],
+                             theory_test=args.theory_test, captcha_mode=args.captcha_mode,
+                             session_timeout=args.session_timeout)
+    mock_server = MockPortalServer(mock_scenario, home_port=args.home_port, booking_port=args.booking_port)
+
+    print("Mock CDC portal running. Add this to browser_config in config.yaml:")
+    print(f"  home_url: \"{mock_server.home_url}\"")
+    print(f"  booking_url: \"{mock_server.booking_url}\"")
+
+    with mock_server:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
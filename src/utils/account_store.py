@@ -0,0 +1,41 @@
+import hashlib
+from typing import Dict, Union
+
+from src.utils.common import utils
+
+
+class AccountStore:
+    """JSON file of state per account, kept across restarts; the session store, eligibility cache and checkpoint.
+
+    Entries are keyed by a hash of the username (learner ids are credentials) and the whole file is rewritten
+    atomically on every change. A file that can't be read loads as empty, it only holds state that can be rebuilt.
+    """
+
+    name = "account store"  # for log messages
+    file_mode = None
+
+    def __init__(self, file_path: str, log):
+        self.file_path = file_path
+        self.log = log
+        self.entries = utils.load_json_file(self.file_path, self.log)
+
+    @staticmethod
+    def get_account_key(username: str):
+        return hashlib.blake2b(username.encode(), digest_size=8).hexdigest()
+
+    def get_entry(self, username: str) -> Union[Dict, None]:
+        return self.entries.get(self.get_account_key(username))
+
+    def set_entry(self, username: str, entry: Dict):
+        self.entries[self.get_account_key(username)] = entry
+        self.write()
+
+    def clear(self, username: str):
+        if self.entries.pop(self.get_account_key(username), None) is not None:
+            self.write()
+
+    def write(self):
+        try:
+            utils.save_json_file(self.file_path, self.entries, file_mode=self.file_mode)
+        except OSError as e:
+            self.log.warning(f"Could not write {self.name} {self.file_path}: {e}")
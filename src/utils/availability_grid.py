@@ -0,0 +1,131 @@
+import datetime
+from typing import Dict, Iterator, List, Tuple
+
+from src.utils.parsers.slot_grid import SlotGrid, SlotState
+
+
+class GridHeader:
+    """Day and session-column labels of a booking grid, shared by every snapshot taken with the same layout."""
+
+    __slots__ = ("days", "times", "dates", "day_index", "time_index", "date_masks")
+
+    _interned: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], "GridHeader"] = {}
+
+    def __init__(self, days: Tuple[str, ...], times: Tuple[str, ...]):
+        self.days = days
+        self.times = times
+        self.dates = tuple(datetime.datetime.strptime(day, "%d/%b/%Y").date() for day in days)
+        self.day_index = {day: idx for idx, day in enumerate(days)}
+        self.time_index = {time_str: idx for idx, time_str in enumerate(times)}
+        self.date_masks: Dict[Tuple[datetime.date, bool], int] = {}
+
+    @classmethod
+    def intern(cls, days: List[str], times: List[str]) -> "GridHeader":
+        key = (tuple(days), tuple(times))
+        if key not in cls._interned:
+            if len(cls._interned) > 64:
+                cls._interned.clear()
+            cls._interned[key] = cls(*key)
+        return cls._interned[key]
+
+    @property
+    def width(self):
+        return len(self.times)
+
+    def bit(self, day_idx: int, column: int):
+        return 1 << (day_idx * self.width + column)
+
+    def position(self, bit_idx: int):
+        day_idx, column = divmod(bit_idx, self.width)
+        return self.days[day_idx], self.times[column]
+
+    def days_before_mask(self, date: datetime.date, inclusive: bool = False) -> int:
+        # Every cell of the days before the date, also of the date itself when inclusive
+        if (date, inclusive) not in self.date_masks:
+            row = (1 << self.width) - 1
+            mask = 0
+            for day_idx, day_date in enumerate(self.dates):
+                if day_date < date or (inclusive and day_date == date):
+                    mask |= row << (day_idx * self.width)
+            self.date_masks[(date, inclusive)] = mask
+        return self.date_masks[(date, inclusive)]
+
+
+class AvailabilityGrid:
+    """Days x session-columns grid stored as one bit plane (a Python int) per slot state.
+
+    Bit (day_idx * width + column) is set in a plane when that cell is in that state, so comparing scans, masking
+    dates and counting slots are plain bitwise operations.
+    """
+
+    __slots__ = ("header", "available", "reserved", "booked")
+
+    def __init__(self, header: GridHeader, available: int = 0, reserved: int = 0, booked: int = 0):
+        self.header = header
+        self.available = available
+        self.reserved = reserved
+        self.booked = booked
+
+    @classmethod
+    def from_slot_grid(cls, slot_grid: SlotGrid, header: GridHeader = None) -> "AvailabilityGrid":
+        header = header or GridHeader.intern(slot_grid.days, slot_grid.times)
+        planes = {SlotState.AVAILABLE: 0, SlotState.RESERVED: 0, SlotState.BOOKED: 0}
+
+        for slot_cell in slot_grid:
+            day_idx = header.day_index.get(slot_cell.date_str)
+            column = header.time_index.get(slot_cell.time_str)
+            if day_idx is not None and column is not None:
+                planes[slot_cell.state] |= header.bit(day_idx, column)
+
+        return cls(header, planes[SlotState.AVAILABLE], planes[SlotState.RESERVED], planes[SlotState.BOOKED])
+
+    def plane(self, state: str) -> int:
+        return getattr(self, state)
+
+    def count(self, state: str = SlotState.AVAILABLE, mask: int = -1) -> int:
+        return bin(self.plane(state) & mask).count("1")
+
+    def earlier_than_mask(self, date: datetime.date, inclusive: bool = False) -> int:
+        return self.header.days_before_mask(date, inclusive)
+
+    def cell_bit(self, date_str: str, time_str: str) -> int:
+        # 0 for a cell outside this grid's layout
+        day_idx = self.header.day_index.get(date_str)
+        column = self.header.time_index.get(time_str)
+        return self.header.bit(day_idx, column) if day_idx is not None and column is not None else 0
+
+    def aligned(self, other: "AvailabilityGrid") -> "AvailabilityGrid":
+        # Re-indexes another scan onto this grid's layout (the window of days moves forward over time)
+        if other.header is self.header:
+            return other
+
+        planes = {}
+        for state in (SlotState.AVAILABLE, SlotState.RESERVED, SlotState.BOOKED):
+            plane = 0
+            for day, time_str in other.cells(other.plane(state)):
+                day_idx = self.header.day_index.get(day)
+                column = self.header.time_index.get(time_str)
+                if day_idx is not None and column is not None:
+                    plane |= self.header.bit(day_idx, column)
+            planes[state] = plane
+
+        return AvailabilityGrid(self.header, planes[SlotState.AVAILABLE], planes[SlotState.RESERVED],
+                                planes[SlotState.BOOKED])
+
+    def changes_since(self, previous: "AvailabilityGrid", state: str = SlotState.AVAILABLE) -> Tuple[int, int]:
+        # Returns (newly set, newly cleared) masks of the plane
+        previous_plane = self.aligned(previous).plane(state)
+        current_plane = self.plane(state)
+        return current_plane & ~previous_plane, previous_plane & ~current_plane
+
+    def cells(self, mask: int) -> Iterator[Tuple[str, str]]:
+        bit_idx = 0
+        while mask:
+            if mask & 1:
+                yield self.header.position(bit_idx)
+            mask >>= 1
+            bit_idx += 1
+
+    def __eq__(self, other):
+        return (isinstance(other, AvailabilityGrid) and self.header is other.header
+                and (self.available, self.reserved, self.booked) == (other.available, other.reserved, other.booked))
@@ -0,0 +1,225 @@
+import atexit
+import base64
+import binascii
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple, Union
+
+ARCHIVE_DIRECTORY = "solved_captchas"
+INDEX_FILE = "index.jsonl"
+IMAGE_DIRECTORY = "images"
+IMAGE_EXTENSION = ".jpeg"
+LEGACY_ARCHIVE_FILE = "archive.jsonl"
+# The index is rewritten once it holds this many superseded lines per live entry
+INDEX_COMPACTION_RATIO = 2
+
+
+def hash_image(image_base64: str) -> str:
+    # Hashed on the decoded bytes, so the same image found with different base64 line breaks maps to the same entry
+    try:
+        image_bytes = base64.b64decode(image_base64)
+    except (ValueError, binascii.Error):
+        image_bytes = image_base64.encode()
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def read_archive(file_path: str) -> Iterator[Dict]:
+    if not os.path.isfile(file_path):
+        return
+
+    with open(file_path) as archive_file:
+        for line in archive_file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A record cut short by a crash, the ones after it are still whole
+                continue
+
+
+class CaptchaArchive:
+    """Content-addressed store of solved captcha images, also used as a cache of their codes.
+
+    Every image is saved once under images/<sha256 of its bytes>.jpeg, no matter how often it is seen. index.jsonl
+    holds one line per change to an entry (hash, code, solver, timestamp, solve latency and whether the portal took the
+    code), the last line for a hash wins. A code the portal took is only replaced by another one it took. The index is
+    kept in memory, files are written by a background thread so saving a captcha never holds up the page it was on.
+    Anything still queued is written out before the program exits.
+    """
+
+    def __init__(self, directory: str, log):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.log = log
+        self.entries: Dict[str, Dict] = {}
+        # New codes for images whose code the portal already took, only kept once the portal takes them too
+        self.candidates: Dict[str, Tuple[Dict, str]] = {}
+        self.index_lines = 0
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+
+        for entry in read_archive(self.index_path):
+            self.entries[entry["hash"]] = entry
+            self.index_lines += 1
+
+        legacy_path = os.path.join(directory, LEGACY_ARCHIVE_FILE)
+        if (os.path.isfile(legacy_path) or self.get_legacy_images() or
+                self.index_lines > INDEX_COMPACTION_RATIO * len(self.entries) + 100):
+            self.compact()
+
+        self.thread = threading.Thread(target=self._write_records, name="captcha-archive", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def get_image_path(self, captcha_hash: str) -> str:
+        return os.path.join(self.directory, IMAGE_DIRECTORY, captcha_hash + IMAGE_EXTENSION)
+
+    def lookup(self, image_base64: str) -> Tuple[str, Union[str, None]]:
+        # Returns the image's hash and its code, if it was solved before and the portal did not reject the code
+        captcha_hash = hash_image(image_base64)
+        entry = self.entries.get(captcha_hash)
+        if entry and entry["correct"] is not False:
+            return captcha_hash, entry["code"]
+        return captcha_hash, None
+
+    def add(self, image_base64: str, code: str, solver: str, latency: Union[float, None] = None) -> str:
+        captcha_hash = hash_image(image_base64)
+        entry = {"hash": captcha_hash, "code": code, "solver": solver, "saved_at": time.time(),
+                 "latency": None if latency is None else round(latency, 3), "correct": None}
+
+        confirmed_entry = self.entries.get(captcha_hash)
+        if confirmed_entry and confirmed_entry["correct"]:
+            if confirmed_entry["code"] != code:
+                self.candidates[captcha_hash] = (entry, image_base64)
+            return captcha_hash
+
+        self.entries[captcha_hash] = entry
+        self.queue.put((entry, image_base64))
+        return captcha_hash
+
+    def mark(self, captcha_hash: str, correct: bool):
+        entry, image_base64 = self.candidates.pop(captcha_hash, (None, None))
+        if entry:
+            # The portal's verdict is on the new code, the confirmed one only gives way to a code it took as well
+            if correct:
+                entry = self.entries[captcha_hash] = dict(entry, correct=True)
+                self.queue.put((entry, image_base64))
+            return
+
+        entry = self.entries.get(captcha_hash)
+        if entry and entry["correct"] is not correct:
+            entry = self.entries[captcha_hash] = dict(entry, correct=correct)
+            self.queue.put((entry, None))
+
+    def flush(self):
+        self.queue.join()
+
+    def _write_records(self):
+        while True:
+            entry, image_base64 = self.queue.get()
+            try:
+                with self.lock:
+                    if image_base64 is not None:
+                        self._write_image(entry["hash"], image_base64)
+                    with open(self.index_path, "a") as index_file:
+                        index_file.write(json.dumps(entry) + "\n")
+                    self.index_lines += 1
+            except (OSError, ValueError, binascii.Error) as e:
+                self.log.warning(f"Could not archive captcha {entry['code']}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write_image(self, captcha_hash: str, image_base64: str):
+        image_path = self.get_image_path(captcha_hash)
+        if not os.path.isfile(image_path):
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            with open(image_path, "wb") as image_file:
+                image_file.write(base64.b64decode(image_base64))
+
+    def get_legacy_images(self):
+        # <code>.jpeg files saved straight into the directory before there was an archive
+        return glob.glob(os.path.join(glob.escape(self.directory), "*" + IMAGE_EXTENSION))
+
+    def _import_record(self, image_base64: str, code: str, solver: str, saved_at: float):
+        captcha_hash = hash_image(image_base64)
+        if captcha_hash not in self.entries:
+            self._write_image(captcha_hash, image_base64)
+            self.entries[captcha_hash] = {"hash": captcha_hash, "code": code, "solver": solver, "saved_at": saved_at,
+                                          "latency": None, "correct": None}
+
+    def _import_legacy(self) -> List[str]:
+        # The flat archive.jsonl and the <code>.jpeg files the archive used to be, moved into the store. Returns the
+        # files to remove once the index holds them. Which solver read a .jpeg was never recorded
+        legacy_path = os.path.join(self.directory, LEGACY_ARCHIVE_FILE)
+        imported_paths = [legacy_path] if os.path.isfile(legacy_path) else []
+        for record in read_archive(legacy_path):
+            self._import_record(record["image"], record["code"], record.get("solver"), record.get("saved_at"))
+
+        for image_path in self.get_legacy_images():
+            code = os.path.splitext(os.path.basename(image_path))[0]
+            if code:
+                with open(image_path, "rb") as image_file:
+                    self._import_record(base64.b64encode(image_file.read()).decode(), code, None,
+                                        os.path.getmtime(image_path))
+                imported_paths.append(image_path)
+        return imported_paths
+
+    def compact(self):
+        """Rewrites the index with one line per entry and drops entries the portal rejected, images included."""
+        with self.lock:
+            try:
+                imported_paths = self._import_legacy()
+
+                rejected = [captcha_hash for captcha_hash, entry in self.entries.items() if entry["correct"] is False]
+                for captcha_hash in rejected:
+                    del self.entries[captcha_hash]
+                    if os.path.isfile(self.get_image_path(captcha_hash)):
+                        os.remove(self.get_image_path(captcha_hash))
+
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = self.index_path + ".tmp"
+                with open(temp_path, "w") as index_file:
+                    for entry in self.entries.values():
+                        index_file.write(json.dumps(entry) + "\n")
+                os.replace(temp_path, self.index_path)
+                self.index_lines = len(self.entries)
+
+                for imported_path in imported_paths:
+                    os.remove(imported_path)
+            except (OSError, ValueError, binascii.Error) as e:
+                self.log.warning(f"Could not compact the captcha archive: {e}")
+
+    def samples(self, include_local: bool = False) -> Iterator[Tuple[str, str]]:
+        # (image base64, code) of every entry the portal did not reject, for training. Codes the local model came up
+        # with itself are unverified unless the portal took them, training on them would only reinforce its mistakes
+        for captcha_hash, entry in list(self.entries.items()):
+            if entry["correct"] is False:
+                continue
+            if entry["solver"] == "local" and not (include_local or entry["correct"]):
+                continue
+
+            image_path = self.get_image_path(captcha_hash)
+            if os.path.isfile(image_path):
+                with open(image_path, "rb") as image_file:
+                    yield base64.b64encode(image_file.read()).decode(), entry["code"]
+
+    def export(self, directory: str, include_local: bool = False) -> int:
+        # Writes the samples out as <code>_<hash prefix>.jpeg, the layout most captcha OCR trainers read
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for image_base64, code in self.samples(include_local):
+            file_name = f"{code}_{hash_image(image_base64)[:12]}{IMAGE_EXTENSION}"
+            with open(os.path.join(directory, file_name), "wb") as image_file:
+                image_file.write(base64.b64decode(image_base64))
+            count += 1
+        return count
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(list(self.entries.values()))
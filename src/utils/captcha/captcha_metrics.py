@@ -0,0 +1,122 @@
+import datetime
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple, Union
+
+from src.utils.metrics import LatencyMetrics
+
+CAPTCHA_STATS_DAYS = 7
+ERROR_STATUSES = ("TIMEOUT", "NETWORK_ERROR", "API_ERROR", "UNKNOWN_ERROR")
+# Statuses 2captcha bills for, a timed-out captcha is usually still solved (and charged) after we stop waiting
+BILLED_STATUSES = ("SOLVED", "TIMEOUT")
+
+# 2captcha polling and timeouts are tuned from the last RECENT_REQUESTS requests of a type, once there are enough
+RECENT_REQUESTS = 50
+MIN_TUNING_SAMPLES = 10
+MIN_POLLING_INTERVAL = 5  # 2captcha advises against polling more often
+POLLING_FRACTION = 0.25  # of the median solve time, an answer then waits for the next poll an eighth of it on average
+TIMEOUT_MARGIN = 3  # times the 95th percentile solve time
+MIN_TIMEOUT = 30
+# Past this share of recent timeouts the workers are slow across the board, and tight timeouts only waste money
+MAX_TIMEOUT_RATE = 0.2
+
+
+class CaptchaStats:
+    __slots__ = ("requests", "errors", "checked", "wrong", "cost")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = dict.fromkeys(ERROR_STATUSES, 0)
+        self.checked = 0
+        self.wrong = 0
+        self.cost = 0.0
+
+    def __str__(self):
+        requests = max(self.requests, 1)
+        error_rates = " ".join(f"{status.lower()}={count / requests:.0%}" for status, count in self.errors.items())
+        return (f"requests={self.requests} {error_rates} wrong={self.wrong}/{self.checked} "
+                f"cost=${self.cost:.3f}")
+
+
+def get_percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(pct / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class CaptchaMetrics:
+    """Latencies, error and wrong-answer rates and cost of captcha solves, per captcha type and solver.
+
+    Stats are kept under "<captcha type>/<solver>" (e.g. normal_captcha/local), latencies for the whole lifetime of
+    the program and everything else per day. The recent 2captcha requests of each type also tune its polling interval
+    and timeout, so a slow worker pool no longer stalls a cycle for the library's fixed two minutes.
+    """
+
+    def __init__(self, cost_per_1000: Dict[str, float]):
+        self.cost_per_1000 = cost_per_1000
+        self.latency = LatencyMetrics()
+        self.daily_stats: "OrderedDict[datetime.date, Dict[str, CaptchaStats]]" = OrderedDict()
+        self.recent: Dict[str, Deque[Tuple[str, float]]] = {}
+        self.settings: Dict[str, Tuple[float, int]] = {}
+        # reCAPTCHA solves run in the background
+        self.lock = threading.Lock()
+
+    def get_stats(self, label: str) -> CaptchaStats:
+        today = datetime.date.today()
+        if today not in self.daily_stats:
+            self.daily_stats[today] = {}
+            while len(self.daily_stats) > CAPTCHA_STATS_DAYS:
+                self.daily_stats.popitem(last=False)
+        return self.daily_stats[today].setdefault(label, CaptchaStats())
+
+    def record_request(self, captcha_type: str, solver: str, status: str, seconds: float):
+        label = f"{captcha_type}/{solver}"
+        with self.lock:
+            stats = self.get_stats(label)
+            stats.requests += 1
+            if status in stats.errors:
+                stats.errors[status] += 1
+            if status == "SOLVED":
+                self.latency.record(label, seconds)
+            if solver == "2captcha":
+                if status in BILLED_STATUSES:
+                    stats.cost += self.cost_per_1000.get(captcha_type, 0) / 1000
+                self.recent.setdefault(captcha_type, deque(maxlen=RECENT_REQUESTS)).append((status, seconds))
+
+    def record_answer(self, captcha_type: str, solver: str, correct: bool):
+        # Whether the portal took the answer, from its "incorrect captcha" and "complete the captcha" alerts
+        with self.lock:
+            stats = self.get_stats(f"{captcha_type}/{solver}")
+            stats.checked += 1
+            stats.wrong += not correct
+
+    def get_solve_settings(self, captcha_type: str, default_timeout: float,
+                           default_polling_interval: int) -> Tuple[float, int]:
+        # Returns the (timeout, polling interval) for the next 2captcha request of this type
+        with self.lock:
+            recent = list(self.recent.get(captcha_type, ()))
+
+        latencies = [seconds for status, seconds in recent if status == "SOLVED"]
+        timeout, polling_interval = default_timeout, default_polling_interval
+        if len(latencies) >= MIN_TUNING_SAMPLES:
+            polling_interval = int(min(default_polling_interval,
+                                       max(MIN_POLLING_INTERVAL, POLLING_FRACTION * get_percentile(latencies, 50))))
+            timeout_rate = sum(status == "TIMEOUT" for status, _ in recent) / len(recent)
+            if timeout_rate <= MAX_TIMEOUT_RATE:
+                timeout = min(default_timeout, max(MIN_TIMEOUT, TIMEOUT_MARGIN * get_percentile(latencies, 95)))
+
+        with self.lock:
+            self.settings[captcha_type] = (timeout, polling_interval)
+        return timeout, polling_interval
+
+    def get_cost(self, day: Union[datetime.date, None] = None) -> float:
+        return sum(stats.cost for stats in self.daily_stats.get(day or datetime.date.today(), {}).values())
+
+    def __str__(self):
+        with self.lock:
+            lines = [str(self.latency)] if self.latency.histograms else []
+            lines += [f"{captcha_type} 2captcha settings: timeout={timeout:.0f}s polling={polling_interval}s"
+                      for captcha_type, (timeout, polling_interval) in sorted(self.settings.items())]
+            for day, day_stats in self.daily_stats.items():
+                lines.append(f"{day}: cost=${sum(stats.cost for stats in day_stats.values()):.3f}")
+                lines += [f"  {label:<38}{stats}" for label, stats in sorted(day_stats.items())]
+        return "\n".join(lines)
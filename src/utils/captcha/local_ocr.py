@@ -0,0 +1,156 @@
+import base64
+import binascii
+import io
+import os
+from typing import Iterable, List, Tuple, Union
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # optional, without numpy and Pillow every captcha goes to 2captcha
+    np = None
+    Image = None
+
+CAPTCHA_LENGTH = 6
+GLYPH_SIZE = (16, 20)  # (width, height) every segmented character is scaled to
+# Sharpness of the per-character softmax over centroid similarities, lower is more decisive
+SIMILARITY_TEMPERATURE = 0.01
+
+
+def is_available():
+    return np is not None
+
+
+def load_pixels(image_base64: str):
+    # Grayscale in [0, 1], dark text on a light background
+    image = Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("L")
+    return np.asarray(image, dtype=np.float32) / 255
+
+
+def otsu_threshold(pixels) -> float:
+    histogram, edges = np.histogram(pixels, bins=64, range=(0, 1))
+    weights = histogram / max(histogram.sum(), 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    background_weight = np.cumsum(weights)
+    background_mean = np.cumsum(weights * centers)
+    total_mean = background_mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between_variance = (total_mean * background_weight - background_mean) ** 2 / (
+                background_weight * (1 - background_weight))
+    return float(centers[np.nanargmax(between_variance)])
+
+
+def split_columns(ink, length: int) -> List[Tuple[int, int]]:
+    # Runs of columns with ink, then the widest are split and the narrowest neighbours merged until there are length
+    has_ink = ink.any(axis=0)
+    runs, start = [], None
+    for column, inked in enumerate(list(has_ink) + [False]):
+        if inked and start is None:
+            start = column
+        elif not inked and start is not None:
+            runs.append((start, column))
+            start = None
+
+    if not runs:
+        return []
+
+    while len(runs) < length:
+        widest = max(range(len(runs)), key=lambda idx: runs[idx][1] - runs[idx][0])
+        run_start, run_end = runs[widest]
+        if run_end - run_start < 2:
+            break
+        middle = (run_start + run_end) // 2
+        runs[widest:widest + 1] = [(run_start, middle), (middle, run_end)]
+
+    while len(runs) > length:
+        narrowest = min(range(len(runs) - 1), key=lambda idx: runs[idx + 1][1] - runs[idx][0])
+        runs[narrowest:narrowest + 2] = [(runs[narrowest][0], runs[narrowest + 1][1])]
+
+    return runs
+
+
+def glyph_features(ink, start: int, end: int):
+    glyph = ink[:, start:end]
+    rows = np.flatnonzero(glyph.any(axis=1))
+    if rows.size:
+        glyph = glyph[rows[0]:rows[-1] + 1]
+
+    scaled = Image.fromarray((glyph * 255).astype(np.uint8)).resize(GLYPH_SIZE, Image.BILINEAR)
+    features = np.asarray(scaled, dtype=np.float32).ravel()
+    norm = np.linalg.norm(features)
+    return features / norm if norm else features
+
+
+def extract_glyphs(image_base64: str, length: int = CAPTCHA_LENGTH):
+    # One feature row per character, None when the image can't be read or split into length characters
+    try:
+        pixels = load_pixels(image_base64)
+    except (OSError, ValueError, binascii.Error):
+        return None
+
+    ink = pixels < otsu_threshold(pixels)
+    runs = split_columns(ink, length)
+    if len(runs) != length:
+        return None
+    return np.stack([glyph_features(ink, start, end) for start, end in runs])
+
+
+class LocalOcrSolver:
+    """Nearest-centroid character classifier for the booking-page text captcha, trained on the captcha archive.
+
+    Characters are segmented on ink columns and compared to one centroid per character seen in training, so a solve
+    is a handful of vector products on the CPU. The confidence is the product of the per-character probabilities.
+    """
+
+    def __init__(self, classes: str, centroids):
+        self.classes = classes
+        self.centroids = centroids
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, str]]) -> Union["LocalOcrSolver", None]:
+        features_per_class = {}
+        for image_base64, code in samples:
+            glyphs = extract_glyphs(image_base64, len(code))
+            if glyphs is None:
+                continue
+            for char, features in zip(code, glyphs):
+                features_per_class.setdefault(char, []).append(features)
+
+        if not features_per_class:
+            return None
+
+        classes = "".join(sorted(features_per_class))
+        centroids = np.stack([np.mean(features_per_class[char], axis=0) for char in classes])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+        return cls(classes, centroids)
+
+    def predict(self, image_base64: str) -> Tuple[str, float]:
+        glyphs = extract_glyphs(image_base64)
+        if glyphs is None:
+            return "", 0.0
+
+        logits = glyphs @ self.centroids.T / SIMILARITY_TEMPERATURE
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = probabilities.argmax(axis=1)
+        code = "".join(self.classes[idx] for idx in best)
+        return code, float(np.prod(probabilities[np.arange(len(best)), best]))
+
+    def save(self, file_path: str):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "wb") as model_file:
+            np.savez_compressed(model_file, classes=np.array(list(self.classes)), centroids=self.centroids)
+
+    @classmethod
+    def load(cls, file_path: str, log) -> Union["LocalOcrSolver", None]:
+        if not is_available():
+            log.warning("numpy and Pillow are needed for the local captcha solver, only 2captcha will be used.")
+            return None
+        if not os.path.isfile(file_path):
+            log.warning(f"No local captcha model at {file_path}, only 2captcha will be used.")
+            return None
+
+        with np.load(file_path) as model:
+            return cls("".join(model["classes"]), model["centroids"])
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Tuple, Union
+
+# reCAPTCHA v2 tokens are accepted for 120 s after they are issued, a little is left for submitting the form
+RECAPTCHA_TOKEN_LIFETIME = 110
+
+
+class RecaptchaSolve:
+    """A reCAPTCHA v2 solve running in the background, so the login form can be filled in while it is worked on."""
+
+    def __init__(self, site_key: str, page_url: str):
+        self.future: Union[Future, None] = None
+        self.site_key = site_key
+        self.page_url = page_url
+        self.started_at = time.perf_counter()
+        self.solved_at = None
+        self.waited = 0.0
+
+    def run(self, solve_token: Callable[[str, str], Tuple[bool, str, str]]):
+        result = solve_token(self.site_key, self.page_url)
+        self.solved_at = time.perf_counter()
+        return result
+
+    def is_usable(self, site_key: str):
+        if self.site_key != site_key:
+            return False
+        if not self.future.done():
+            return True
+        return self.future.result()[0] and time.perf_counter() - self.solved_at < RECAPTCHA_TOKEN_LIFETIME
+
+    def wait(self) -> Tuple[bool, str, str]:
+        # Returns (success, status, token or error)
+        t_start = time.perf_counter()
+        result = self.future.result()
+        self.waited = time.perf_counter() - t_start
+        return result
+
+    @property
+    def time_saved(self):
+        # Solve time that overlapped other work instead of being waited on
+        if self.solved_at is None:
+            return 0.0
+        return max(self.solved_at - self.started_at - self.waited, 0.0)
+
+
+class RecaptchaTokens:
+    """Starts reCAPTCHA v2 solves in the background and keeps at most one prefetched token for the next login.
+
+    solve_token(site_key, page_url) does the actual (blocking) solve and returns (success, status, token or error).
+    """
+
+    def __init__(self, solve_token: Callable[[str, str], Tuple[bool, str, str]], max_workers: int = 2):
+        self.solve_token = solve_token
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.prefetched: Union[RecaptchaSolve, None] = None
+
+        # Where the last login's reCAPTCHA was, a prefetch before the next one solves for the same
+        self.site_key = None
+        self.page_url = None
+
+    def submit(self, site_key: str, page_url: str) -> RecaptchaSolve:
+        recaptcha_solve = RecaptchaSolve(site_key, page_url)
+        recaptcha_solve.future = self.executor.submit(recaptcha_solve.run, self.solve_token)
+        return recaptcha_solve
+
+    def start(self, site_key: str, page_url: str) -> RecaptchaSolve:
+        # Tokens are single use, a prefetched one is handed out once
+        self.site_key, self.page_url = site_key, page_url
+        prefetched, self.prefetched = self.prefetched, None
+        if prefetched and prefetched.is_usable(site_key):
+            return prefetched
+        return self.submit(site_key, page_url)
+
+    def prefetch(self) -> bool:
+        if not self.site_key:
+            return False
+        if not (self.prefetched and self.prefetched.is_usable(self.site_key)):
+            self.prefetched = self.submit(self.site_key, self.page_url)
+        return True
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.getcwd())
+
+from src.utils.captcha.captcha_archive import ARCHIVE_DIRECTORY, CaptchaArchive
+from src.utils.captcha.local_ocr import CAPTCHA_LENGTH, LocalOcrSolver, is_available
+from src.utils.common import utils
+
+DEFAULT_MODEL_FILE = os.path.join("models", "captcha_ocr.npz")
+
+
+def load_samples(archive: CaptchaArchive, include_local: bool):
+    # Opening the archive has already moved any <code>.jpeg files saved before it existed into it
+    return [(image_base64, code) for image_base64, code in archive.samples(include_local)
+            if len(code) == CAPTCHA_LENGTH]
+
+
+def evaluate(solver: LocalOcrSolver, samples, min_confidence: float):
+    correct = confident = confident_correct = 0
+    for image_base64, code in samples:
+        predicted, confidence = solver.predict(image_base64)
+        correct += predicted == code
+        if confidence >= min_confidence:
+            confident += 1
+            confident_correct += predicted == code
+
+    total = max(len(samples), 1)
+    print(f"Held out {len(samples)}: accuracy {correct / total:.1%}, at confidence >= {min_confidence}: "
+          f"{confident / total:.1%} answered locally, {confident_correct / max(confident, 1):.1%} of those correct")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local booking-page captcha solver on archived captchas.")
+    parser.add_argument("--archive", default=ARCHIVE_DIRECTORY,
+                        help="Directory of the captcha archive, <code>.jpeg files in it are imported first")
+    parser.add_argument("--model", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--holdout", type=float, default=0.1, help="Share of the captchas kept back for evaluation")
+    parser.add_argument("--min-confidence", type=float, default=0.9)
+    parser.add_argument("--include-local", action="store_true",
+                        help="Also train on codes the local model solved that the portal has not confirmed")
+    parser.add_argument("--compact", action="store_true", help="Compact the archive's index before training")
+    parser.add_argument("--export", metavar="DIRECTORY",
+                        help="Only export the archived captchas as <code>_<hash>.jpeg files to DIRECTORY")
+    args = parser.parse_args()
+
+    archive = CaptchaArchive(args.archive, utils.DEFAULT_LOG)
+    if args.compact:
+        archive.compact()
+    if args.export:
+        print(f"Exported {archive.export(args.export, args.include_local)} captchas to {args.export}")
+        sys.exit()
+
+    if not is_available():
+        sys.exit("numpy and Pillow are needed to train the local captcha solver.")
+
+    all_samples = load_samples(archive, args.include_local)
+    holdout_every = round(1 / args.holdout) if args.holdout > 0 else 0
+    held_out = [sample for idx, sample in enumerate(all_samples) if holdout_every and idx % holdout_every == 0]
+    training = [sample for idx, sample in enumerate(all_samples) if not (holdout_every and idx % holdout_every == 0)]
+
+    model = LocalOcrSolver.train(training)
+    if model is None:
+        sys.exit(f"No usable captchas in {args.archive}, turn on save_solved_captchas to collect some.")
+
+    print(f"Trained on {len(training)} captchas, {len(model.classes)} characters seen.")
+    if held_out:
+        evaluate(model, held_out, args.min_confidence)
+
+    model.save(args.model)
+    print(f"Saved the model to {args.model}")
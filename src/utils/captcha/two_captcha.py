@@ -1,9 +1,7 @@
-import base64
-import os
 import time
 import traceback
 from types import LambdaType
-from typing import Dict
+from typing import Dict, Union
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -11,13 +9,22 @@ from twocaptcha import TwoCaptcha
 from twocaptcha.api import ApiException, NetworkException
 from twocaptcha.solver import TimeoutException
 
-from src.utils.common import selenium_common, utils
+from src.utils.captcha.captcha_archive import ARCHIVE_DIRECTORY, CaptchaArchive
+from src.utils.captcha.captcha_metrics import CaptchaMetrics
+from src.utils.captcha.local_ocr import CAPTCHA_LENGTH, LocalOcrSolver
+from src.utils.captcha.recaptcha_tokens import RecaptchaSolve, RecaptchaTokens
+from src.utils.common import selenium_common
 from src.utils.log import Log
 
 DEFAULT_CONFIG = {
     "api_key": None,
     "enabled": True,
-    "debug_mode": True
+    "debug_mode": True,
+    "local_ocr_model": None,
+    "local_ocr_min_confidence": 0.9,
+    "adaptive_timeouts": True,
+    "normal_captcha_cost": 1.0,
+    "recaptcha_v2_cost": 2.99
 }
 
 
@@ -28,81 +35,215 @@ class Captcha:
         self.log = log
         self.enabled = config["enabled"]
         self.debug_enabled = config["debug_mode"]
+        self.recaptcha_tokens = RecaptchaTokens(self.solve_recaptcha_token)
+        self.archive = CaptchaArchive(ARCHIVE_DIRECTORY, log) if log.config["save_solved_captchas"] else None
+        # Hash and solver of the last booking-page captcha answered, marked right or wrong once the portal checked it
+        self.last_captcha_hash = None
+        self.last_captcha_solver = None
 
-    def _solve_captcha(self, solve_callback: LambdaType, result_callback: LambdaType, debug_enabled: bool):
+        # USD per 1000 solves, as billed by 2captcha
+        self.metrics = CaptchaMetrics({"normal_captcha": config.get("normal_captcha_cost", 1.0),
+                                       "recaptcha_v2": config.get("recaptcha_v2_cost", 2.99)})
+        self.adaptive_timeouts = config.get("adaptive_timeouts", True)
+        self.default_timeouts = {"normal_captcha": solver.default_timeout, "recaptcha_v2": solver.recaptcha_timeout}
+        self.default_polling_interval = solver.polling_interval
+
+        # Tried before 2captcha on booking-page captchas, 2captcha still gets the ones it is not confident about
+        local_ocr_model = config.get("local_ocr_model")
+        self.local_solver = LocalOcrSolver.load(local_ocr_model, log) if local_ocr_model else None
+        self.local_min_confidence = config.get("local_ocr_min_confidence", 0.9)
+
+    def _solve_captcha(self, captcha_type: str, solve_callback: LambdaType, result_callback: LambdaType,
+                       debug_enabled: bool):
         result = None
+        status = "UNKNOWN_ERROR"
+        t_start = time.perf_counter()
         try:
             result = solve_callback()
             self.log.debug_if(debug_enabled, "Received 2Captcha response...")
         except TimeoutException as e:
             self.log.debug_if(debug_enabled, f"2Captcha API has timed-out! : {str(e)}")
-            result = (False, "TIMEOUT", e)
+            status = "TIMEOUT"
+            result = (False, status, e)
         except NetworkException as e:
             self.log.debug_if(debug_enabled, f"2Captcha API has encountered a network error! : {str(e)}")
-            result = (False, "NETWORK_ERROR", e)
+            status = "NETWORK_ERROR"
+            result = (False, status, e)
         except ApiException as e:
             self.log.debug_if(debug_enabled, f"2Captcha API has encountered an API error : {str(e)}")
-            result = (False, "API_ERROR", e)
+            status = "API_ERROR"
+            result = (False, status, e)
         except Exception as e:
             self.log.error(e)
             self.log.error(traceback.format_exc())
-            result = (False, "UNKNOWN_ERROR", e)
+            result = (False, status, e)
         else:
+            status = "SOLVED"
             result_callback(result)
-            result = (True, "SOLVED", result)
+            result = (True, status, result)
         finally:
+            self.metrics.record_request(captcha_type, "2captcha", status, time.perf_counter() - t_start)
             self.log.debug_if(debug_enabled, result)
             return result
 
-    def save_captcha(self, driver: webdriver, captcha_image_filepath: str):
+    def get_solve_settings(self, captcha_type: str):
+        # (timeout, polling interval) of the next 2captcha request, tuned from the recent ones unless turned off
+        default_timeout = self.default_timeouts[captcha_type]
+        if not self.adaptive_timeouts:
+            return default_timeout, self.default_polling_interval
+        return self.metrics.get_solve_settings(captcha_type, default_timeout, self.default_polling_interval)
+
+    def request_normal(self, image_base64: str):
+        timeout, polling_interval = self.get_solve_settings("normal_captcha")
+        return self.solver.normal(image_base64, caseSensitive=1, minLength=6, maxLength=6, timeout=timeout,
+                                  polling_interval=polling_interval)
+
+    def request_recaptcha(self, site_key: str, page_url: str):
+        # The parameters recaptcha() would send, through solve() since recaptcha() always passes the solver-wide
+        # timeout and solves run on several threads
+        timeout, polling_interval = self.get_solve_settings("recaptcha_v2")
+        return self.solver.solve(timeout=timeout, polling_interval=polling_interval, googlekey=site_key, url=page_url,
+                                 method="userrecaptcha", version="v2", enterprise=0)
+
+    def get_captcha_image(self, driver: webdriver):
+        # Returns the captcha image as the base64 of its data: src, and the input its code goes in
         captcha_element = selenium_common.is_elem_present(driver, By.ID, "ctl00_ContentPlaceHolder1_CaptchaImg")
         captcha_input = selenium_common.is_elem_present(driver, By.ID, "ctl00_ContentPlaceHolder1_txtVerificationCode")
 
         if captcha_element and captcha_input:
-            img_base64_str = captcha_element.get_attribute("src")[23:]
-            img_base64 = str.encode(img_base64_str)
+            return captcha_element.get_attribute("src").split(",", 1)[-1], captcha_input
+
+        return None, None
+
+    def archive_captcha(self, image_base64: str, code: str, solver: str, latency: Union[float, None] = None):
+        self.last_captcha_solver = solver
+        if self.archive:
+            self.last_captcha_hash = self.archive.add(image_base64, code, solver, latency)
 
-            with open(captcha_image_filepath, "wb") as image_file:
-                image_file.write(base64.decodebytes(img_base64))
+    def report_captcha_result(self, correct: bool, captcha_type: str = "normal_captcha"):
+        # Called once the portal has taken or rejected the last captcha answer of this type
+        if captcha_type == "recaptcha_v2":
+            self.metrics.record_answer(captcha_type, "2captcha" if self.enabled else "manual", correct)
+            return
 
-            return captcha_input
+        captcha_hash, self.last_captcha_hash = self.last_captcha_hash, None
+        solver, self.last_captcha_solver = self.last_captcha_solver, None
+        if solver:
+            self.metrics.record_answer(captcha_type, solver, correct)
+        if self.archive and captcha_hash:
+            self.archive.mark(captcha_hash, correct)
 
-        return False
+    def solve_from_archive(self, image_base64: str, debug_enabled: bool) -> Union[str, None]:
+        if not self.archive:
+            return None
+
+        t_start = time.perf_counter()
+        captcha_hash, code = self.archive.lookup(image_base64)
+        if code:
+            self.log.debug_if(debug_enabled, f"Captcha seen before, answering {code!r} from the archive.")
+            self.last_captcha_hash, self.last_captcha_solver = captcha_hash, "archive"
+            self.metrics.record_request("normal_captcha", "archive", "SOLVED", time.perf_counter() - t_start)
+        return code
+
+    def solve_locally(self, image_base64: str, debug_enabled: bool) -> Union[str, None]:
+        code = self.solve_from_archive(image_base64, debug_enabled)
+        if code or not self.local_solver:
+            return code
+
+        t_start = time.perf_counter()
+        code, confidence = self.local_solver.predict(image_base64)
+        if len(code) != CAPTCHA_LENGTH or confidence < self.local_min_confidence:
+            self.log.debug_if(debug_enabled, f"Local OCR read {code!r} with confidence {confidence:.2f}, "
+                                             f"falling back to 2captcha.")
+            return None
+
+        latency = time.perf_counter() - t_start
+        self.log.debug_if(debug_enabled, f"Local OCR read {code!r} with confidence {confidence:.2f} in "
+                                         f"{latency * 1000:.1f}ms.")
+        self.archive_captcha(image_base64, code, "local", latency)
+        self.metrics.record_request("normal_captcha", "local", "SOLVED", latency)
+        return code
 
     def normal_captcha(self, driver: webdriver, page_url: str, debug_enabled: bool):
-        captcha_image_filepath = os.path.join("temp", "normal_captcha.jpeg")
-        captcha_input = self.save_captcha(driver, captcha_image_filepath)
+        image_base64, captcha_input = self.get_captcha_image(driver)
         if captcha_input:
+            t_start = time.perf_counter()
+            code = self.solve_locally(image_base64, debug_enabled)
+            if code:
+                captcha_input.send_keys(code)
+                return True, "SOLVED", {"code": code}
+
             success, status, msg = self._solve_captcha(
-                solve_callback=lambda: self.solver.normal(captcha_image_filepath, caseSensitive=1, minLength=6,
-                                                          maxLength=6),
+                captcha_type="normal_captcha",
+                solve_callback=lambda: self.request_normal(image_base64),
                 result_callback=lambda result: captcha_input.send_keys(str(result["code"])),
                 debug_enabled=debug_enabled
             )
 
-            if self.log.config["save_solved_captchas"] and success and status == "SOLVED":
-                os.rename(captcha_image_filepath, os.path.join("solved_captchas", f"{msg['code']}.jpeg"))
-            else:
-                utils.remove_files([captcha_image_filepath])
+            if success and status == "SOLVED":
+                self.archive_captcha(image_base64, str(msg["code"]), "2captcha", time.perf_counter() - t_start)
 
             return success, status, msg
 
         return False, "NO CAPTCHA FOUND IN", page_url
 
+    def solve_recaptcha_token(self, site_key: str, page_url: str):
+        success, status, msg = self._solve_captcha(
+            captcha_type="recaptcha_v2",
+            solve_callback=lambda: self.request_recaptcha(site_key, page_url),
+            result_callback=lambda result: None,
+            debug_enabled=self.debug_enabled
+        )
+        return success, status, str(msg["code"]) if success else msg
+
+    def start_recaptcha(self, site_key: str, page_url: str) -> RecaptchaSolve:
+        # Returns at once, the solve (or a prefetched token) is waited on with RecaptchaSolve.wait
+        return self.recaptcha_tokens.start(site_key, page_url)
+
+    def prefetch_recaptcha(self):
+        # Solves ahead of an expected login on the last login's reCAPTCHA, False if there was none yet
+        return self.enabled and self.recaptcha_tokens.prefetch()
+
     def recaptcha_v2(self, driver: webdriver, page_url: str, debug_enabled: bool):
         site_key_element = selenium_common.is_elem_present(driver, By.CSS_SELECTOR, "[data-sitekey]")
         if site_key_element:
-            site_key = site_key_element.get_attribute("data-sitekey")
-            return self._solve_captcha(
-                solve_callback=lambda: self.solver.recaptcha(sitekey=site_key, url=page_url),
-                result_callback=lambda result: driver.execute_script(
-                    """document.querySelector('[name="g-recaptcha-response"]').innerText='{}'""".format(
-                        str(result["code"]))),
-                debug_enabled=debug_enabled
-            )
+            success, status, token = self.start_recaptcha(site_key_element.get_attribute("data-sitekey"),
+                                                          page_url).wait()
+            if success:
+                driver.execute_script(selenium_common.RECAPTCHA_RESPONSE_SCRIPT, token)
+            return success, status, token
 
         return False, "NO RECAPTCHA_V2 FOUND IN", page_url
 
+    def solve_image(self, img_base64_str: str, page_url: str, force_enable: bool = False, force_debug: bool = False):
+        t_start = time.perf_counter()
+        debug_enabled = self.debug_enabled or force_debug
+
+        if not (self.enabled or force_enable):
+            self.log.error(f"Cannot manually solve a NORMAL_CAPTCHA without a browser for: {page_url}")
+            return False, "CAPTCHA SOLVER DISABLED", page_url
+
+        self.log.debug_if(debug_enabled, f"Solving NORMAL_CAPTCHA for: {page_url}")
+        code = self.solve_locally(img_base64_str, debug_enabled)
+        if code:
+            return True, "SOLVED", code
+
+        success, status, msg = self._solve_captcha(
+            captcha_type="normal_captcha",
+            solve_callback=lambda: self.request_normal(img_base64_str),
+            result_callback=lambda result: None,
+            debug_enabled=debug_enabled
+        )
+
+        if success:
+            self.log.debug_if(debug_enabled, "Took {t} seconds to solve the NORMAL_CAPTCHA using two-captcha!".format(
+                t=time.perf_counter() - t_start
+            ))
+            self.archive_captcha(img_base64_str, str(msg["code"]), "2captcha", time.perf_counter() - t_start)
+            return success, status, str(msg["code"])
+
+        return success, status, msg
+
     def solve(self, driver: webdriver, captcha_type: str = None, page_url: str = None, force_enable: bool = False,
               force_debug: bool = False):
         t_start = time.perf_counter()
@@ -133,12 +274,13 @@ class Captcha:
         self.log.debug_if(debug_enabled, f"Manually solving CAPTCHA for: {page_url}")
         input("Press enter to proceed: ")
 
-        if self.log.config["save_solved_captchas"] and captcha_type.lower() == "normal_captcha":
-            captcha_input = selenium_common.is_elem_present(driver, By.ID,
-                                                            "ctl00_ContentPlaceHolder1_txtVerificationCode")
+        self.metrics.record_request(captcha_type.lower(), "manual", "SOLVED", time.perf_counter() - t_start)
+        if captcha_type.lower() == "normal_captcha":
+            self.last_captcha_hash, self.last_captcha_solver = None, "manual"
+            image_base64, captcha_input = self.get_captcha_image(driver) if self.archive else (None, None)
             if captcha_input:
-                self.save_captcha(driver,
-                                  os.path.join("solved_captchas", f"{captcha_input.get_attribute('value')}.jpeg"))
+                self.archive_captcha(image_base64, captcha_input.get_attribute("value"), "manual",
+                                     time.perf_counter() - t_start)
 
         self.log.debug_if(debug_enabled, "Took exactly {t} seconds to solve the {n} manually!".format(
             t=time.perf_counter() - t_start,
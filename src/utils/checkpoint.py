@@ -0,0 +1,27 @@
+import time
+from typing import Dict, Union
+
+from src.utils.account_store import AccountStore
+
+
+class Checkpoint(AccountStore):
+    """Cross-cycle handler state per account, saved at the end of every cycle so a restart picks up where it left off.
+
+    Only state that would otherwise cost page loads, clicks or repeated messages to rebuild is kept; anything older
+    than max_age is ignored, the portal will have moved on by then.
+    """
+
+    name = "checkpoint"
+
+    def __init__(self, file_path: str, log, max_age: float = 24 * 3600):
+        super().__init__(file_path, log)
+        self.max_age = max_age
+
+    def get(self, username: str) -> Union[Dict, None]:
+        entry = self.get_entry(username)
+        if not entry or time.time() - entry.get("saved_at", 0) > self.max_age:
+            return None
+        return entry["state"]
+
+    def set(self, username: str, state: Dict):
+        self.set_entry(username, {"saved_at": time.time(), "state": state})
@@ -2,7 +2,32 @@ class selenium_common:
     import selenium
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import TimeoutException
+    from selenium.common.exceptions import (JavascriptException, StaleElementReferenceException, TimeoutException,
+                                            UnexpectedAlertPresentException, WebDriverException)
+
+    # Ready once the document has loaded, no ASP.NET UpdateProgress overlay is showing and, when ids are given, at
+    # least one of them is present
+    PAGE_READY_SCRIPT = """
+    var progress = document.getElementById('ctl00_ContentPlaceHolder1_UpdateProgress1');
+    if (document.readyState !== 'complete' || (progress && progress.getClientRects().length > 0)) {
+        return false;
+    }
+    return arguments[0].length === 0 || arguments[0].some(function (elem_id) {
+        return document.getElementById(elem_id) !== null;
+    });
+    """
+
+    # Maps every present id to whether it is visible, absent ids are left out
+    PROBE_ELEMS_SCRIPT = """
+    var probe = {};
+    arguments[0].forEach(function (elem_id) {
+        var elem = document.getElementById(elem_id);
+        if (elem) {
+            probe[elem_id] = elem.getClientRects().length > 0;
+        }
+    });
+    return probe;
+    """
 
     def wait_for_elem(driver: selenium.webdriver, locator_type: str, locator: str, timeout: int = 5):
         return selenium_common.WebDriverWait(driver, timeout).until(
@@ -14,6 +39,83 @@ class selenium_common:
         except selenium_common.TimeoutException:
             return False
 
+    def wait_for_page_ready(driver: selenium.webdriver, ready_ids: tuple = (), timeout: int = 10):
+        # An open alert counts as ready, scripts would fail on it and the caller is the one to handle it
+        try:
+            return selenium_common.WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                lambda d: selenium_common.EC.alert_is_present()(d) or d.execute_script(
+                    selenium_common.PAGE_READY_SCRIPT, list(ready_ids)))
+        except selenium_common.TimeoutException:
+            return False
+
+    def probe_elems(driver: selenium.webdriver, element_ids: list, timeout: int = 10):
+        # One wait for the page, then one round trip for every id instead of an is_elem_present timeout per absent id
+        selenium_common.wait_for_page_ready(driver, timeout=timeout)
+        return driver.execute_script(selenium_common.PROBE_ELEMS_SCRIPT, list(element_ids)) or {}
+
+    IMAGE_SRC_SCRIPT = """
+    var elem = document.getElementById(arguments[0]);
+    return elem ? elem.getAttribute('src') : null;
+    """
+
+    def wait_for_alert_or_image(driver: selenium.webdriver, element_id: str, image_name: str, timeout: int = 10):
+        # Returns as soon as either an alert opens (True and its text, the alert is dismissed as in dismiss_alert) or
+        # the image button's src has switched to image_name (False, ""), so a postback without an alert no longer
+        # costs the whole timeout. (None, reason) when neither happened: the click is unconfirmed, not a success
+        def is_confirmed(d):
+            return selenium_common.EC.alert_is_present()(d) or (
+                    d.execute_script(selenium_common.IMAGE_SRC_SCRIPT, element_id) or "").endswith(image_name)
+
+        try:
+            # Scripts fail and the cell goes stale while the postback swaps the page, that is not an answer yet
+            confirmation = selenium_common.WebDriverWait(
+                driver, timeout, poll_frequency=0.1,
+                ignored_exceptions=(selenium_common.JavascriptException, selenium_common.StaleElementReferenceException)
+            ).until(is_confirmed)
+            if confirmation is True:
+                return False, ""
+
+            alert_txt = confirmation.text
+            confirmation.accept()
+        except selenium_common.UnexpectedAlertPresentException as e:
+            # The alert beat the script run, the driver has already closed it
+            return True, e.alert_text or ""
+        except selenium_common.TimeoutException:
+            return None, f"Neither an alert nor {image_name} within {timeout}s"
+        except selenium_common.WebDriverException as e:
+            return None, str(e)
+        else:
+            return True, alert_txt
+
+    RECAPTCHA_SITE_KEY_SCRIPT = """
+    var elem = document.querySelector('[data-sitekey]');
+    return elem ? elem.getAttribute('data-sitekey') : null;
+    """
+
+    RECAPTCHA_RESPONSE_SCRIPT = """
+    document.querySelector('[name="g-recaptcha-response"]').innerText = arguments[0];
+    """
+
+    # Same-origin HEAD request from the page, which refreshes the ASP.NET session without rendering or fetching assets.
+    # Returns [status, final url, response header length], status 0 when it failed (e.g. redirected off-origin)
+    KEEP_ALIVE_SCRIPT = """
+    var xhr = new XMLHttpRequest();
+    try {
+        xhr.open('HEAD', arguments[0], false);
+        xhr.send();
+    } catch (e) {
+        return null;
+    }
+    return [xhr.status, xhr.responseURL, xhr.getAllResponseHeaders().length];
+    """
+
+    def ping(driver: selenium.webdriver, url: str):
+        # Returns [status, final url, header bytes], None when the request could not be made at all
+        try:
+            return driver.execute_script(selenium_common.KEEP_ALIVE_SCRIPT, url)
+        except selenium_common.WebDriverException:
+            return None
+
     def dismiss_alert(driver: selenium.webdriver, timeout: int = 2):
         alert_txt = ""
         try:
@@ -30,7 +132,7 @@ class selenium_common:
 
 
 class utils:
-    import shutil, os, yaml
+    import json, shutil, os, tempfile, yaml
     from datetime import date, datetime
 
     class DEFAULT_LOG:
@@ -46,6 +148,9 @@ class utils:
         def warn(*args):
             print("[WARN]", utils.concat_tuple(args))
 
+        def warning(*args):
+            print("[WARN]", utils.concat_tuple(args))
+
     def load_config_from_yaml_file(file_path: str, log=DEFAULT_LOG):
         if not utils.os.path.isfile(file_path):
             raise Exception(f"No file found at {file_path}")
@@ -57,6 +162,30 @@ class utils:
                 log.error(exception)
             return config
 
+    def load_json_file(file_path: str, log=DEFAULT_LOG):
+        # A missing or unreadable file loads as empty, it only holds state that can be rebuilt
+        if not utils.os.path.isfile(file_path):
+            return {}
+
+        try:
+            with open(file_path) as json_file:
+                return utils.json.load(json_file)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read {file_path}: {e}")
+            return {}
+
+    def save_json_file(file_path: str, data, file_mode: int = None):
+        directory = utils.os.path.dirname(file_path) or "."
+        utils.os.makedirs(directory, exist_ok=True)
+
+        # Written next to the target and swapped in, so a crash never leaves a half-written file behind
+        file_descriptor, temp_path = utils.tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with utils.os.fdopen(file_descriptor, "w") as temp_file:
+            utils.json.dump(data, temp_file, indent=2)
+        if file_mode is not None:
+            utils.os.chmod(temp_path, file_mode)
+        utils.os.replace(temp_path, file_path)
+
     def init_config_with_default(config: dict, default_config: dict):
         for configValue, configType in enumerate(default_config):
             if not utils.check_key_existence_in_dict(config, configType):
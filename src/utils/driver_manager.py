@@ -0,0 +1,165 @@
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Union
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+
+def start_browser(browser_type: str, headless: bool):
+    platform = "linux" if "linux" in sys.platform else "windows" if "win32" in sys.platform else "osx"
+
+    options = browser_type.lower() == "firefox" and webdriver.FirefoxOptions() or webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--no-proxy-server")
+
+    driver_name = "geckodriver" if browser_type.lower() == "firefox" else "chromedriver"
+    if platform == "windows":
+        driver_name += ".exe"
+    executable_path = os.path.join("drivers", platform, driver_name)
+
+    if browser_type.lower() == "firefox":
+        driver = webdriver.Firefox(executable_path=executable_path, options=options)
+    else:
+        driver = webdriver.Chrome(executable_path=executable_path, options=options)
+
+    driver.set_window_size(1600, 768)
+    return driver
+
+
+def get_process_tree_rss(pid: int) -> Union[int, None]:
+    # Resident memory (bytes) of a process and all its descendants, None where /proc is not available
+    if not os.path.isdir(f"/proc/{pid}"):
+        return None
+
+    total_rss = 0
+    pending_pids = [pid]
+    while pending_pids:
+        current_pid = pending_pids.pop()
+        try:
+            with open(f"/proc/{current_pid}/status") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        total_rss += int(line.split()[1]) * 1024
+                        break
+
+            for task_id in os.listdir(f"/proc/{current_pid}/task"):
+                with open(f"/proc/{current_pid}/task/{task_id}/children") as children_file:
+                    pending_pids.extend(int(child_pid) for child_pid in children_file.read().split())
+        except (OSError, ValueError):
+            continue
+
+    return total_rss
+
+
+class DriverManager:
+    """Keeps one warm browser for the whole program, so a restart only costs a login instead of a browser startup.
+
+    The browser is handed to every new handler and only replaced when it stops answering or its process tree grows
+    past max_rss_mb. With keep_spare, a second browser is started in the background so a replacement is ready at once.
+    """
+
+    def __init__(self, browser_config, log):
+        self.browser_type = browser_config["type"] or "firefox"
+        self.headless = browser_config["headless_mode"] or False
+        self.keep_spare = browser_config.get("keep_spare_driver", False)
+        self.max_rss_mb = browser_config.get("driver_max_rss_mb", 1500)
+        self.log = log
+
+        self.driver = None
+        self.spare: Union[Future, None] = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.recycle_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start_driver(self):
+        return start_browser(self.browser_type, self.headless)
+
+    def start_spare(self):
+        if self.keep_spare and self.spare is None:
+            self.spare = self.executor.submit(self.start_driver)
+
+    def take_spare(self):
+        if self.spare is None:
+            return None
+
+        spare, self.spare = self.spare, None
+        try:
+            driver = spare.result()
+        except (WebDriverException, OSError) as e:
+            self.log.warning(f"Spare browser failed to start: {e}")
+            return None
+
+        if not self.is_healthy(driver):
+            self.quit_driver(driver)
+            return None
+        return driver
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        try:
+            return driver.execute_script("return 1;") == 1 and len(driver.window_handles) > 0
+        except WebDriverException:
+            return False
+
+    def get_rss_mb(self, driver) -> Union[float, None]:
+        service = getattr(driver, "service", None)
+        process = getattr(service, "process", None)
+        rss = get_process_tree_rss(process.pid) if process else None
+        return rss / (1024 * 1024) if rss is not None else None
+
+    def needs_recycle(self, driver) -> Union[str, None]:
+        # Returns why the browser has to be replaced, None while it can be reused
+        if not self.is_healthy(driver):
+            return "not responding"
+
+        rss_mb = self.get_rss_mb(driver)
+        if rss_mb is not None and rss_mb > self.max_rss_mb:
+            return f"using {rss_mb:.0f} MB (limit {self.max_rss_mb} MB)"
+        return None
+
+    def acquire(self):
+        if self.driver is not None:
+            reason = self.needs_recycle(self.driver)
+            if reason is None:
+                self.log.info("Reusing the warm browser.")
+                self.start_spare()
+                return self.driver
+
+            self.log.info(f"Recycling the browser, it is {reason}.")
+            self.quit_driver(self.driver)
+            self.driver = None
+            self.recycle_count += 1
+
+        self.driver = self.take_spare() or self.start_driver()
+        self.start_spare()
+        return self.driver
+
+    def release(self, driver):
+        # Handlers give the browser back instead of closing it, it stays open for the next one
+        if driver is not self.driver:
+            self.quit_driver(driver)
+
+    def quit_driver(self, driver):
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            self.log.warning(f"Could not quit the browser cleanly: {e}")
+
+    def close(self):
+        if self.driver is not None:
+            self.quit_driver(self.driver)
+            self.driver = None
+
+        spare = self.take_spare()
+        if spare is not None:
+            self.quit_driver(spare)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,33 @@
+import time
+from typing import Union
+
+from src.utils.account_store import AccountStore
+
+
+class EligibilityCache(AccountStore):
+    """Outcome of the "can book next" reservation probe per account and type, kept on disk across restarts.
+
+    An entry is only trusted while it is younger than the TTL and was taken with the same eligibility key (a
+    fingerprint of what can change the outcome, e.g. the booked lessons).
+    """
+
+    name = "eligibility cache"
+
+    def __init__(self, file_path: str, ttl: float, log):
+        super().__init__(file_path, log)
+        self.ttl = ttl
+
+    def get(self, username: str, field_type: str, eligibility_key: str) -> Union[bool, None]:
+        entry = (self.get_entry(username) or {}).get(field_type)
+        if not entry or entry["key"] != eligibility_key or time.time() - entry["checked_at"] > self.ttl:
+            return None
+        return entry["can_book"]
+
+    def set(self, username: str, field_type: str, eligibility_key: str, can_book: bool):
+        entry = self.get_entry(username) or {}
+        entry[field_type] = {
+            "can_book": can_book,
+            "key": eligibility_key,
+            "checked_at": time.time(),
+        }
+        self.set_entry(username, entry)
@@ -0,0 +1,71 @@
+import datetime
+import time
+from collections import OrderedDict
+from typing import Union
+
+# Pings go out at this fraction of the estimated session timeout, never more often than MIN_KEEP_ALIVE_INTERVAL
+KEEP_ALIVE_SAFETY_FACTOR = 0.5
+MIN_KEEP_ALIVE_INTERVAL = 60
+KEEP_ALIVE_STATS_DAYS = 7
+
+
+class KeepAliveStats:
+    __slots__ = ("count", "bytes", "seconds", "expired", "failed")
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.expired = 0
+        self.failed = 0
+
+    def __str__(self):
+        return (f"pings={self.count} bytes={self.bytes} time={self.seconds:.2f}s expired={self.expired} "
+                f"failed={self.failed}")
+
+
+class KeepAlive:
+    """Paces the session keep-alive pings from the portal's observed session timeout and tallies their cost per day.
+
+    The timeout starts at the configured value (ASP.NET defaults to 20 minutes). A session found expired after being
+    idle for less than that lowers the estimate, one still alive after being idle for longer raises it. Pings that
+    failed (alive is None) say nothing about the session and are only tallied.
+    """
+
+    def __init__(self, session_timeout: float = 1200):
+        self.session_timeout = session_timeout
+        self.last_ping_at = time.perf_counter()
+        self.daily_stats: "OrderedDict[datetime.date, KeepAliveStats]" = OrderedDict()
+
+    @property
+    def interval(self) -> float:
+        return max(MIN_KEEP_ALIVE_INTERVAL, self.session_timeout * KEEP_ALIVE_SAFETY_FACTOR)
+
+    def record(self, alive: Union[bool, None], num_bytes: int, seconds: float,
+               idle_seconds: Union[float, None] = None):
+        if idle_seconds is not None and alive is not None:
+            if alive and idle_seconds > self.session_timeout:
+                self.session_timeout = idle_seconds
+            elif not alive and idle_seconds < self.session_timeout:
+                self.session_timeout = max(idle_seconds, MIN_KEEP_ALIVE_INTERVAL / KEEP_ALIVE_SAFETY_FACTOR)
+
+        if alive:
+            self.last_ping_at = time.perf_counter()
+
+        today = datetime.date.today()
+        if today not in self.daily_stats:
+            self.daily_stats[today] = KeepAliveStats()
+            while len(self.daily_stats) > KEEP_ALIVE_STATS_DAYS:
+                self.daily_stats.popitem(last=False)
+
+        stats = self.daily_stats[today]
+        stats.count += 1
+        stats.bytes += num_bytes
+        stats.seconds += seconds
+        stats.expired += alive is False
+        stats.failed += alive is None
+
+    def __str__(self):
+        lines = [f"interval={self.interval:.0f}s (estimated session timeout {self.session_timeout:.0f}s)"]
+        lines += [f"{day}: {stats}" for day, stats in self.daily_stats.items()]
+        return "\n".join(lines)
@@ -0,0 +1,67 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Upper bounds (seconds) of the histogram buckets, anything slower lands in the last (open) bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations, small enough to keep for the whole lifetime of the program."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        # Upper bound of the bucket holding the percentile, the observed max for the open bucket
+        rank = pct / 100 * self.count
+        seen = 0
+        for bucket_idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                return LATENCY_BUCKETS[bucket_idx] if bucket_idx < len(LATENCY_BUCKETS) else self.max
+        return 0.0
+
+    def __str__(self):
+        return (f"n={self.count} mean={self.mean:.2f}s p50<={self.percentile(50):.2f}s "
+                f"p95<={self.percentile(95):.2f}s max={self.max:.2f}s total={self.total:.1f}s")
+
+
+class LatencyMetrics:
+    """Named latency histograms, e.g. one per page a navigation waits on."""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def record(self, name: str, seconds: float):
+        self.histograms.setdefault(name, LatencyHistogram()).record(seconds)
+
+    @contextmanager
+    def measure(self, name: str):
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t_start)
+
+    def __getitem__(self, name: str) -> LatencyHistogram:
+        return self.histograms.setdefault(name, LatencyHistogram())
+
+    def __str__(self):
+        return "\n".join(f"{name:<40}{histogram}" for name, histogram in sorted(self.histograms.items()))
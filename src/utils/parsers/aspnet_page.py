@@ -0,0 +1,143 @@
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Union
+from urllib.parse import urljoin
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "wbr"}
+
+ALERT_PATTERN = re.compile(r"""alert\(\s*(['"])(.*?)(?<!\\)\1\s*\)""", re.DOTALL)
+
+
+class AspNetPage:
+    """State of a WebForms page as seen by a plain HTTP client: form fields, elements by id and queued alerts."""
+
+    def __init__(self, url: str, html: str):
+        self.url = url
+        self.html = html
+        self.form_action = ""
+        self.fields: Dict[str, str] = {}
+        self.elements: Dict[str, Dict] = {}
+        self.selects: Dict[str, Dict] = {}
+        self.alerts: List[str] = [alert.replace("\\'", "'").replace('\\"', '"').replace("\\n", "\n")
+                                  for _, alert in ALERT_PATTERN.findall(html)]
+
+    def get_postback_url(self):
+        return urljoin(self.url, self.form_action or self.url)
+
+    def get_postback_data(self, event_target: str = "", extra_fields: Union[Dict, None] = None,
+                          submit_id: Union[str, None] = None) -> Dict[str, str]:
+        # The form as the browser would submit it for a __doPostBack (or a click on submit_id)
+        form_data = dict(self.fields)
+        form_data.update({"__EVENTTARGET": event_target, "__EVENTARGUMENT": ""})
+        form_data.update(extra_fields or {})
+
+        if submit_id:
+            form_data[self.get_name(submit_id)] = self.get_attribute(submit_id, "value") or ""
+        return form_data
+
+    def has_element(self, element_id: str):
+        return element_id in self.elements
+
+    def get_attribute(self, element_id: str, attribute: str):
+        element = self.elements.get(element_id)
+        return element["attrs"].get(attribute) if element else None
+
+    def get_text(self, element_id: str):
+        element = self.elements.get(element_id)
+        return " ".join("".join(element["text"]).split()) if element else ""
+
+    def get_name(self, element_id: str):
+        return self.get_attribute(element_id, "name") or element_id.replace("_", "$")
+
+
+class AspNetPageParser(HTMLParser):
+    def __init__(self, page: AspNetPage):
+        super().__init__(convert_charrefs=True)
+        self.page = page
+
+        self._open_elements = []  # [tag, element, same-tag nesting depth]
+        self._select = None
+        self._option = None
+        self._textarea = None
+
+    def handle_starttag(self, tag: str, attrs: list):
+        attrs = {key: value if value is not None else "" for key, value in attrs}
+
+        for open_element in self._open_elements:
+            if open_element[0] == tag:
+                open_element[2] += 1
+
+        element_id = attrs.get("id")
+        if element_id:
+            element = {"tag": tag, "attrs": attrs, "text": []}
+            self.page.elements[element_id] = element
+            if tag not in VOID_TAGS:
+                self._open_elements.append([tag, element, 1])
+
+        if tag == "form" and not self.page.form_action:
+            self.page.form_action = attrs.get("action", "")
+        elif tag == "input":
+            self.handle_input(attrs)
+        elif tag == "select":
+            self._select = {"name": attrs.get("name", ""), "options": [], "selected": 0}
+            if element_id:
+                self.page.selects[element_id] = self._select
+        elif tag == "option" and self._select is not None:
+            self._option = [attrs.get("value"), ""]
+            self._select["options"].append(self._option)
+            if "selected" in attrs:
+                self._select["selected"] = len(self._select["options"]) - 1
+        elif tag == "textarea" and attrs.get("name"):
+            self._textarea = attrs["name"]
+            self.page.fields[self._textarea] = ""
+
+    def handle_startendtag(self, tag: str, attrs: list):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_input(self, attrs: Dict):
+        name = attrs.get("name")
+        input_type = attrs.get("type", "text").lower()
+        if not name or input_type in ("submit", "image", "button", "reset", "file"):
+            return
+
+        if input_type in ("checkbox", "radio"):
+            if "checked" in attrs:
+                self.page.fields[name] = attrs.get("value") or "on"
+        else:
+            self.page.fields[name] = attrs.get("value", "")
+
+    def handle_endtag(self, tag: str):
+        for open_element in reversed(self._open_elements):
+            if open_element[0] == tag:
+                open_element[2] -= 1
+        self._open_elements = [open_element for open_element in self._open_elements if open_element[2] > 0]
+
+        if tag == "option":
+            self._option = None
+        elif tag == "select" and self._select is not None:
+            options = self._select["options"]
+            if options and self._select["name"]:
+                option_value, option_text = options[self._select["selected"]]
+                self.page.fields[self._select["name"]] = option_value if option_value is not None else option_text
+            self._select = None
+        elif tag == "textarea":
+            self._textarea = None
+
+    def handle_data(self, data: str):
+        for open_element in self._open_elements:
+            open_element[1]["text"].append(data)
+
+        if self._option is not None:
+            self._option[1] += data
+        if self._textarea is not None:
+            self.page.fields[self._textarea] += data
+
+
+def parse_aspnet_page(html: Union[str, None], url: str = "") -> AspNetPage:
+    page = AspNetPage(url, html or "")
+    parser = AspNetPageParser(page)
+    parser.feed(page.html)
+    parser.close()
+    return page
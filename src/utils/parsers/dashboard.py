@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Union
+
+from abstracts.cdc_abstract import Types
+from src.utils.parsers.html_table import get_cells, parse_table
+
+BOOKED_TABLE_ID = "ctl00_ContentPlaceHolder1_gvBooked"
+RESERVED_TABLE_ID = "ctl00_ContentPlaceHolder1_gvReserved"
+
+# Returns both Dashboard tables in a single WebDriver round trip
+DASHBOARD_SCRIPT = f"""
+return ['{BOOKED_TABLE_ID}', '{RESERVED_TABLE_ID}'].map(function (table_id) {{
+    var table = document.getElementById(table_id);
+    return table ? table.outerHTML : '';
+}}).join('');
+"""
+
+# Checked in order, the first keyword found in the lesson name decides its type
+lesson_type_keywords = (
+    ("SIMULATOR", Types.SIMULATOR),
+    ("AUTOCAR", Types.PRACTICAL),
+    ("2BL", Types.PRACTICAL),
+    ("ONETEAM", Types.PRACTICAL),
+    ("BTT", Types.BTT),
+    ("RTT", Types.RTT),
+    ("FTT", Types.FTT),
+    ("PT", Types.PT),
+)
+
+
+class LessonRecord(NamedTuple):
+    date_str: str
+    start_time: str
+    end_time: str
+    lesson_name: str
+    field_type: str
+
+    @property
+    def time_slot(self):
+        return f"{self.start_time} - {self.end_time}"
+
+
+class DashboardSnapshot:
+    __slots__ = ("booked", "reserved")
+
+    def __init__(self, booked: Dict[str, List[LessonRecord]], reserved: Dict[str, List[LessonRecord]]):
+        self.booked = booked
+        self.reserved = reserved
+
+
+@lru_cache(maxsize=256)
+def get_lesson_type(lesson_name: str) -> Union[str, None]:
+    for keyword, field_type in lesson_type_keywords:
+        if keyword in lesson_name:
+            return field_type
+
+    return None
+
+
+def parse_lesson_table(html: Union[str, None], table_id: str) -> Dict[str, List[LessonRecord]]:
+    lessons = {}
+
+    for row in parse_table(html, table_id):
+        td_cells = get_cells(row, "td")
+        if len(td_cells) < 5:
+            continue
+
+        lesson_name = td_cells[4].text
+        field_type = get_lesson_type(lesson_name)
+        if not field_type:
+            continue
+
+        # Times are shown as "HH:MM:SS"
+        lesson = LessonRecord(td_cells[0].text, td_cells[2].text[:-3], td_cells[3].text[:-3], lesson_name, field_type)
+        lessons.setdefault(field_type, []).append(lesson)
+
+    return lessons
+
+
+def parse_dashboard(html: Union[str, None]) -> DashboardSnapshot:
+    return DashboardSnapshot(
+        booked=parse_lesson_table(html, BOOKED_TABLE_ID),
+        reserved=parse_lesson_table(html, RESERVED_TABLE_ID)
+    )
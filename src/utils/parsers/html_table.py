@@ -0,0 +1,108 @@
+import re
+from html.parser import HTMLParser
+from typing import List, Union
+
+
+class TableCell:
+    __slots__ = ("tag", "lines", "inputs")
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self.lines = [""]
+        self.inputs = []
+
+    @property
+    def text(self):
+        # Mirrors selenium's WebElement.text: whitespace collapsed, <br> rendered as a new line
+        return "\n".join(line for line in (" ".join(line.split()) for line in self.lines) if line)
+
+
+class HTMLTableParser(HTMLParser):
+    """Collects the rows of a single <table> (selected by id) from an HTML document."""
+
+    def __init__(self, table_id: str):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.rows: List[List[TableCell]] = []
+        self.found = False
+
+        self._depth = 0  # table nesting depth relative to the target table (0 = outside)
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag == "table":
+            if self._depth > 0:
+                self._depth += 1
+            elif dict(attrs).get("id") == self.table_id:
+                self._depth = 1
+                self.found = True
+            return
+
+        if self._depth != 1:
+            return
+
+        if tag == "tr":
+            self._row = []
+            self.rows.append(self._row)
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = TableCell(tag)
+            self._row.append(self._cell)
+        elif tag == "br" and self._cell is not None:
+            self._cell.lines.append("")
+        elif tag == "input" and self._cell is not None:
+            self._cell.inputs.append(dict(attrs))
+
+    def handle_startendtag(self, tag: str, attrs: list):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        if tag == "table" and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._row, self._cell = None, None
+            return
+
+        if self._depth != 1:
+            return
+
+        if tag in ("td", "th"):
+            self._cell = None
+        elif tag == "tr":
+            self._row, self._cell = None, None
+
+    def handle_data(self, data: str):
+        if self._cell is not None:
+            self._cell.lines[-1] += data
+
+
+def parse_table(html: Union[str, None], table_id: str) -> List[List[TableCell]]:
+    if not html:
+        return []
+
+    parser = HTMLTableParser(table_id)
+    parser.feed(html)
+    parser.close()
+    return parser.rows
+
+
+def get_cells(row: List[TableCell], tag: str) -> List[TableCell]:
+    return [cell for cell in row if cell.tag == tag]
+
+
+def extract_table_html(html: Union[str, None], table_id: str) -> str:
+    # Slices the outer HTML of one <table> out of a page without parsing it, nested tables included
+    if not html:
+        return ""
+
+    id_idx = html.find(f'id="{table_id}"')
+    start = html.rfind("<table", 0, id_idx) if id_idx >= 0 else -1
+    if start < 0:
+        return ""
+
+    depth = 0
+    for match in re.compile(r"<(/?)table\b", re.IGNORECASE).finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return html[start:html.index(">", match.end()) + 1]
+    return html[start:]
@@ -0,0 +1,115 @@
+from typing import List, NamedTuple, Union
+
+from abstracts.cdc_abstract import Types
+from src.utils.parsers.html_table import get_cells, parse_table
+
+SLOT_GRID_TABLE_ID = "ctl00_ContentPlaceHolder1_gvLatestav"
+
+# Returns the whole slot grid in a single WebDriver round trip
+SLOT_GRID_SCRIPT = f"""
+var table = document.getElementById('{SLOT_GRID_TABLE_ID}');
+return table ? table.outerHTML : '';
+"""
+
+
+class SlotState:
+    AVAILABLE = "available"  # Images1.gif
+    RESERVED = "reserved"  # Images2.gif
+    BOOKED = "booked"  # Images3.gif
+
+
+slot_state_images = {
+    "Images1.gif": SlotState.AVAILABLE,
+    "Images2.gif": SlotState.RESERVED,
+    "Images3.gif": SlotState.BOOKED,
+}
+
+slot_image_names = {state: image_name for image_name, state in slot_state_images.items()}
+
+
+class SlotCell(NamedTuple):
+    date_str: str
+    time_str: str
+    state: str
+    element_id: str
+    row: int
+    column: int
+
+
+class SlotGrid:
+    __slots__ = ("days", "times", "cells")
+
+    def __init__(self, days: List[str], times: List[str], cells: List[SlotCell]):
+        self.days = days
+        self.times = times
+        self.cells = cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def cells_with_state(self, state: str):
+        return [cell for cell in self.cells if cell.state == state]
+
+
+def get_slot_state(image_src: Union[str, None]):
+    if image_src:
+        for image_name, state in slot_state_images.items():
+            if image_name in image_src:
+                return state
+
+    return None
+
+
+def get_header_time(header_text: str):
+    # e.g. "Session 1\n08:30 - 10:10"
+    header_lines = header_text.split("\n")
+    return header_lines[1] if len(header_lines) > 1 else None
+
+
+def parse_slot_grid(table_html: Union[str, None], field_type: str) -> SlotGrid:
+    rows = parse_table(table_html, SLOT_GRID_TABLE_ID)
+
+    days, times, cells = [], [], []
+    header_texts = []
+    start_col = 4 if field_type == Types.SIMULATOR else 2
+
+    for row in rows:
+        th_cells = get_cells(row, "th")
+        if th_cells and not header_texts:
+            header_texts = [th_cell.text for th_cell in th_cells]
+
+        for th_cell in th_cells[2:]:
+            time_str = get_header_time(th_cell.text)
+            if time_str and time_str not in times:
+                times.append(time_str)
+
+        td_cells = get_cells(row, "td")
+        if not td_cells:
+            continue
+
+        date_str = td_cells[0].text
+        if date_str not in days:
+            days.append(date_str)
+        row_idx = days.index(date_str)
+
+        for td_cell in td_cells:
+            for input_attrs in td_cell.inputs:
+                state = get_slot_state(input_attrs.get("src"))
+                if not state:
+                    continue
+
+                # e.g. ctl00_ContentPlaceHolder1_gvLatestav_ctl02_btnSession4 (02 is row, 4 is column)
+                element_id = str(input_attrs.get("id"))
+                column = int(element_id.split('_')[-1][10:]) - 1
+
+                header_idx = column + start_col
+                time_str = get_header_time(header_texts[header_idx]) if header_idx < len(header_texts) else None
+                if time_str is None:
+                    continue
+
+                cells.append(SlotCell(date_str, time_str, state, element_id, row_idx, column))
+
+    return SlotGrid(days, times, cells)
@@ -0,0 +1,208 @@
+import datetime
+import time
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+from abstracts.cdc_abstract import Types
+from abstracts.slot_set import Slot, SlotSet
+
+
+class ReservationRule:
+    """A constraint the portal enforces on reservations, checked locally so a click it would reject is never made."""
+
+    name = ""
+    stops_reserving = False  # the portal refuses every further reservation of the type once this is hit
+
+    def allows(self, slot: Slot, booked: SlotSet, held: List[Slot]) -> bool:
+        return True
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{key}={value}' for key, value in vars(self).items())})"
+
+
+class EarlierThanBooked(ReservationRule):
+    name = "earlier than booked"
+
+    def __init__(self, same_day: bool):
+        self.same_day = same_day
+
+    def allows(self, slot: Slot, booked: SlotSet, held: List[Slot]) -> bool:
+        if not booked:
+            return True
+        return slot.date < booked.last().date or (self.same_day and slot.date in booked.dates())
+
+
+class NoBackToBack(ReservationRule):
+    # Sessions on the same day at most max_gap apart count as back to back
+    name = "Back to Back session is not allowed"
+
+    def __init__(self, max_gap_minutes: int = 30):
+        self.max_gap_minutes = max_gap_minutes
+
+    def allows(self, slot: Slot, booked: SlotSet, held: List[Slot]) -> bool:
+        max_gap = datetime.timedelta(minutes=self.max_gap_minutes)
+        return not any(
+            other.date == slot.date and (datetime.timedelta(0) <= other.start - slot.end <= max_gap
+                                         or datetime.timedelta(0) <= slot.start - other.end <= max_gap)
+            for other in list(booked) + held
+        )
+
+
+class ReservationLimit(ReservationRule):
+    name = "exceeded the maximum number"
+    stops_reserving = True
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def allows(self, slot: Slot, booked: SlotSet, held: List[Slot]) -> bool:
+        return len(held) < self.limit
+
+
+class Blocked(ReservationRule):
+    # Refusals that are not about the slot itself (e.g. no store value left), they only last for the current cycle
+    stops_reserving = True
+
+    def __init__(self, reason: str):
+        self.name = reason
+        self.reason = reason
+
+    def allows(self, slot: Slot, booked: SlotSet, held: List[Slot]) -> bool:
+        return False
+
+
+# Rules that outlive a cycle, by name, so learned ones can be checkpointed
+rule_types = {rule_type.__name__: rule_type for rule_type in (EarlierThanBooked, NoBackToBack, ReservationLimit)}
+
+# Alert texts of refused reservations, checked in order, and the rule each one teaches (given the held count)
+alert_rules = (
+    ("Back to Back", lambda held_count: NoBackToBack()),
+    ("exceeded the maximum number", lambda held_count: ReservationLimit(held_count)),
+    ("Store Value:", lambda held_count: Blocked("Store Value:")),
+    ("before", lambda held_count: Blocked("before")),
+)
+
+
+# A learned rule is dropped this long after the portal last confirmed it, it may have changed the rule since
+LEARNED_RULE_MAX_AGE = 24 * 3600
+
+
+class ReservationPlan(NamedTuple):
+    to_unreserve: SlotSet
+    to_reserve: SlotSet
+    rejected: Dict[Slot, str]  # earlier slots a click would have been wasted on -> name of the rule they break
+
+
+class ReservationPlanner:
+    """Works out which slots to unreserve and which to reserve in one pass over the earliest sessions, before any click.
+
+    Every type starts from the rules known up front; alerts seen while reserving add learned ones, which are kept
+    for LEARNED_RULE_MAX_AGE after the last alert that taught them (Blocked ones only until the next cycle).
+    """
+
+    def __init__(self, reserve_for_same_day: bool):
+        self.default_rules = {field_type: [EarlierThanBooked(reserve_for_same_day)] for field_type in
+                              [Types.SIMULATOR, Types.PRACTICAL, Types.BTT, Types.RTT, Types.FTT, Types.PT]}
+        self.default_rules[Types.SIMULATOR].append(NoBackToBack())
+
+        self.learned_rules: Dict[str, List[ReservationRule]] = {}
+        self.learned_at: Dict[Tuple[str, str], float] = {}  # (field type, repr of the rule) -> when it was learned
+        self.avoided_clicks = 0
+
+    def new_cycle(self):
+        for field_type, rules in self.learned_rules.items():
+            self.learned_rules[field_type] = [rule for rule in rules if not isinstance(rule, Blocked)
+                                              and not self.is_expired(field_type, rule)]
+        kept_keys = {(field_type, repr(rule)) for field_type, rules in self.learned_rules.items() for rule in rules}
+        self.learned_at = {key: learned_at for key, learned_at in self.learned_at.items() if key in kept_keys}
+
+    def is_expired(self, field_type: str, rule: ReservationRule) -> bool:
+        return time.time() - self.learned_at.get((field_type, repr(rule)), 0) > LEARNED_RULE_MAX_AGE
+
+    def get_rules(self, field_type: str) -> List[ReservationRule]:
+        return self.default_rules[field_type] + self.learned_rules.get(field_type, [])
+
+    def get_broken_rule(self, field_type: str, slot: Slot, booked: SlotSet,
+                        held: List[Slot]) -> Union[ReservationRule, None]:
+        return next((rule for rule in self.get_rules(field_type) if not rule.allows(slot, booked, held)), None)
+
+    def plan(self, field_type: str, candidates: SlotSet, booked: SlotSet, reserved: SlotSet, slots_wanted: int,
+             reserved_elsewhere: Union[SlotSet, None] = None) -> ReservationPlan:
+        # Sweeps candidates and current reservations in chronological order: reservations are kept while there is
+        # room, candidates are taken while they break no rule. Reservations that can't be clicked (out of view) are
+        # always kept. Slot rules see every current reservation as held, so the result errs on the side of skipping
+        # a slot rather than wasting a click. Unreservations go first, so a limit only caps the planned total.
+        rules = self.get_rules(field_type)
+        limit_rules = [rule for rule in rules if isinstance(rule, ReservationLimit)]
+        slot_rules = [rule for rule in rules if not isinstance(rule, ReservationLimit)]
+        capacity = min([slots_wanted] + [rule.limit for rule in limit_rules])
+        reserved_elsewhere = reserved_elsewhere if reserved_elsewhere is not None else SlotSet()
+
+        chosen = list(reserved_elsewhere)
+        rejected = {}
+        stopped = False
+
+        for slot in candidates | reserved:
+            if len(chosen) >= capacity:
+                if capacity < slots_wanted and slot not in reserved:
+                    # the one click that would have hit the limit
+                    rejected[slot] = min(limit_rules, key=lambda rule: rule.limit).name
+                break
+
+            if slot in reserved:
+                chosen.append(slot)
+                continue
+
+            if stopped:
+                continue
+
+            held = chosen + [reserved_slot for reserved_slot in reserved if reserved_slot not in chosen]
+            broken_rule = next((rule for rule in slot_rules if not rule.allows(slot, booked, held)), None)
+            if broken_rule:
+                rejected[slot] = broken_rule.name
+                stopped = broken_rule.stops_reserving
+                continue
+
+            chosen.append(slot)
+
+        self.avoided_clicks += len(rejected)
+        kept = SlotSet(chosen)
+        return ReservationPlan(to_unreserve=reserved - kept, to_reserve=kept - reserved - reserved_elsewhere,
+                               rejected=rejected)
+
+    def get_learned_state(self) -> Dict[str, List]:
+        return {field_type: [[type(rule).__name__, vars(rule), self.learned_at.get((field_type, repr(rule)), 0)]
+                             for rule in rules if type(rule).__name__ in rule_types]
+                for field_type, rules in self.learned_rules.items()}
+
+    def load_learned_state(self, learned_state: Dict[str, List]):
+        # Entries without a learned_at (checkpointed before rules expired) are of unknown age and dropped
+        self.learned_rules, self.learned_at = {}, {}
+        for field_type, rules in learned_state.items():
+            for rule_name, rule_vars, *learned_at in rules:
+                if rule_name not in rule_types or not learned_at:
+                    continue
+                rule = rule_types[rule_name](**rule_vars)
+                self.learned_at[(field_type, repr(rule))] = learned_at[0]
+                if not self.is_expired(field_type, rule):
+                    self.learned_rules.setdefault(field_type, []).append(rule)
+
+    def learn(self, field_type: str, alert_text: str, held_count: int) -> Union[ReservationRule, None]:
+        # Returns the rule the alert maps to, None for alerts that say nothing about later reservations. held_count
+        # is a lower bound (not every reservation is visible), and the portal never allows less than one
+        for keyword, make_rule in alert_rules:
+            if keyword in alert_text:
+                rule = make_rule(max(held_count, 1))
+                self.learned_at[(field_type, repr(rule))] = time.time()
+                if rule in self.get_rules(field_type):
+                    return rule
+
+                # A newer limit replaces the old one, the portal may have changed it
+                learned_rules = [learned_rule for learned_rule in self.learned_rules.get(field_type, [])
+                                 if not type(rule) is type(learned_rule) is ReservationLimit]
+                self.learned_rules[field_type] = learned_rules + [rule]
+                return rule
+
+        return None
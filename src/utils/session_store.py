@@ -0,0 +1,54 @@
+import base64
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Union
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+from src.utils.account_store import AccountStore
+
+KEY_DERIVATION_ITERATIONS = 480000
+
+
+@lru_cache(maxsize=8)
+def derive_key(password: str, salt: bytes) -> Fernet:
+    # Slow on purpose, cached so saving and restoring within one run only pays for it once
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KEY_DERIVATION_ITERATIONS)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(password.encode())))
+
+
+class SessionStore(AccountStore):
+    """Authenticated session (cookies, booking port, user agent) per account, encrypted on disk across restarts.
+
+    Each entry is encrypted with a key derived from the account password, so the file is useless without the config
+    it was written with. Entries older than max_age are never handed out, the portal would have dropped them anyway.
+    """
+
+    name = "session store"
+    file_mode = 0o600
+
+    def __init__(self, file_path: str, log, max_age: int = 12 * 3600):
+        super().__init__(file_path, log)
+        self.max_age = max_age
+
+    def get(self, username: str, password: str) -> Union[Dict, None]:
+        entry = self.get_entry(username)
+        if not entry:
+            return None
+
+        fernet = derive_key(password, base64.b64decode(entry["salt"]))
+        try:
+            return json.loads(fernet.decrypt(entry["token"].encode(), ttl=self.max_age))
+        except InvalidToken:
+            # Expired, or written with a password that has since changed
+            self.clear(username)
+            return None
+
+    def set(self, username: str, password: str, session: Dict):
+        entry = self.get_entry(username)
+        salt = base64.b64decode(entry["salt"]) if entry else os.urandom(16)
+        token = derive_key(password, salt).encrypt(json.dumps(session).encode())
+        self.set_entry(username, {"salt": base64.b64encode(salt).decode(), "token": token.decode()})
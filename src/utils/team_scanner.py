@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import requests
+
+from abstracts.slot_set import SlotSet
+from src.utils.parsers.aspnet_page import AspNetPage
+from src.utils.parsers.html_table import extract_table_html
+from src.utils.parsers.slot_grid import SLOT_GRID_TABLE_ID, SlotState, parse_slot_grid
+
+REQUEST_TIMEOUT = 30
+
+
+class TeamScanner:
+    """Fetches the slot grids of the other OneTeams concurrently, one HTTP session per worker on the login cookies.
+
+    Every team is a postback of the same page state, as if its option had just been picked in the dropdown, so the
+    page the handler is on keeps showing the home team.
+    """
+
+    def __init__(self, cookies: List[Dict], user_agent: str, log, max_workers: int = 4):
+        self.cookies = cookies
+        self.user_agent = user_agent
+        self.log = log
+        self.max_workers = max_workers
+        self._local = threading.local()
+
+    def get_session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            session.headers.update({"User-Agent": self.user_agent})
+            for cookie in self.cookies:
+                session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"),
+                                    path=cookie.get("path", "/"))
+            self._local.session = session
+        return self._local.session
+
+    def fetch_team(self, page: AspNetPage, select_id: str, option_idx: int, field_type: str) -> Tuple[str, SlotSet]:
+        select = page.selects[select_id]
+        option_value, option_text = select["options"][option_idx]
+        form_data = page.get_postback_data(
+            event_target=select["name"],
+            extra_fields={select["name"]: option_value if option_value is not None else option_text}
+        )
+
+        response = self.get_session().post(page.get_postback_url(), data=form_data, timeout=REQUEST_TIMEOUT)
+        slot_grid = parse_slot_grid(extract_table_html(response.text, SLOT_GRID_TABLE_ID), field_type)
+
+        team_sessions = SlotSet()
+        for slot_cell in slot_grid.cells_with_state(SlotState.AVAILABLE):
+            team_sessions.add(slot_cell.date_str, slot_cell.time_str)
+        return option_text.strip(), team_sessions
+
+    def scan(self, page: AspNetPage, select_id: str, field_type: str) -> Dict[str, SlotSet]:
+        # Option 0 is the "select a team" placeholder, the results keep the dropdown's order
+        option_indices = range(1, len(page.selects[select_id]["options"]))
+        if not option_indices:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(option_indices))) as executor:
+            futures = [executor.submit(self.fetch_team, page, select_id, option_idx, field_type)
+                       for option_idx in option_indices]
+
+        team_sessions = {}
+        for future in futures:
+            try:
+                team_name, sessions = future.result()
+                team_sessions[team_name] = sessions
+            except requests.RequestException as e:
+                self.log.warning(f"Could not fetch the sessions of a team: {e}")
+        return team_sessions
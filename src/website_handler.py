@@ -1,29 +1,56 @@
 import datetime
+import hashlib
 import os
 import re
 import sys
 import time
-from typing import Dict, Union
+from collections import Counter, deque
+from typing import Dict, List, Union
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select, WebDriverWait
+from selenium.webdriver.support.ui import Select
 
-from abstracts.cdc_abstract import CDCAbstract, Types
+from abstracts.cdc_abstract import CDCAbstract, Types, field_types
+from abstracts.slot_set import Slot, SlotSet, parse_slot
+from src.utils.availability_grid import AvailabilityGrid, GridHeader
+from src.utils.checkpoint import Checkpoint
 from src.utils.common import selenium_common
-
-
-def convert_to_datetime(date_str: str, time_str: str = None):
-    if time_str:
-        time_str = time_str.split(' ')[0]
-        return datetime.datetime.strptime(f'{date_str} | {time_str}', '%d/%b/%Y | %H:%M')
-    else:
-        return datetime.datetime.strptime(date_str, "%d/%b/%Y")
+from src.utils.driver_manager import start_browser
+from src.utils.eligibility_cache import EligibilityCache
+from src.utils.keep_alive import KeepAlive
+from src.utils.metrics import LatencyMetrics
+from src.utils.reservation_planner import EarlierThanBooked, ReservationPlanner
+from src.utils.session_store import SessionStore
+from src.utils.parsers.aspnet_page import AspNetPage, parse_aspnet_page
+from src.utils.parsers.dashboard import DASHBOARD_SCRIPT, parse_dashboard
+from src.utils.parsers.slot_grid import (SLOT_GRID_SCRIPT, SLOT_GRID_TABLE_ID, SlotState, parse_slot_grid,
+                                         slot_image_names)
+from src.utils.team_scanner import TeamScanner
+
+
+GRID_HISTORY_LENGTH = 48
+# Files kept across restarts, in program_config.state_directory
+ELIGIBILITY_CACHE_FILE = "eligibility.json"
+SESSION_STORE_FILE = "sessions.json"
+CHECKPOINT_FILE = "checkpoint.json"
+KEEP_ALIVE_PAGE = "NewPortal/Booking/StatementBooking.aspx"
+# Static file on the booking host, loading it puts the browser on that origin so the stored cookies can be set
+SESSION_PRIMER_PATH = "Images/Images1.gif"
+THEORY_TEST_PAGE = "NewPortal/Booking/BookingTT.aspx"
+FULL_BOOK_MSG_ID = "ctl00_ContentPlaceHolder1_lblFullBookMsg"
+CAPTCHA_IMG_ID = "ctl00_ContentPlaceHolder1_CaptchaImg"
+OTHER_TEAM_SELECT_ID = "ctl00_ContentPlaceHolder1_ddlOthTeamID"
+
+theory_test_names = {
+    "Basic Theory Test": Types.BTT,
+    "Riding Theory Test": Types.RTT,
+    "Final Theory Test": Types.FTT,
+}
 
 
 class handler(CDCAbstract):
-    def __init__(self, login_credentials, captcha_solver, log, notification_manager, browser_config, program_config):
+    def __init__(self, login_credentials, captcha_solver, log, notification_manager, browser_config, program_config,
+                 driver=None, driver_manager=None):
         browser_type = browser_config["type"] or "firefox"
         headless = browser_config["headless_mode"] or False
 
@@ -31,8 +58,8 @@ class handler(CDCAbstract):
             log.error("Invalid browser_type was given!")
             raise Exception("Invalid BROWSER_TYPE")
 
-        self.home_url = "https://www.cdc.com.sg"
-        self.booking_url = "https://bookingportal.cdc.com.sg:"
+        self.home_url = browser_config.get("home_url") or "https://www.cdc.com.sg"
+        self.booking_url = browser_config.get("booking_url") or "https://bookingportal.cdc.com.sg:"
         self.port = ""
 
         self.captcha_solver = captcha_solver
@@ -45,12 +72,39 @@ class handler(CDCAbstract):
         self.auto_reserve = program_config["auto_reserve"]
         self.auto_restart = program_config["auto_restart"]
         self.reserve_for_same_day = program_config["reserve_for_same_day"]
+        self.reserve_first = program_config.get("reserve_first", False)
+        self.earlier_than_booked = EarlierThanBooked(self.reserve_for_same_day)
+        self.planner = ReservationPlanner(self.reserve_for_same_day)  # keeps rules learned from alerts across cycles
+        state_directory = program_config.get("state_directory", "state")
+        self.eligibility_cache = EligibilityCache(os.path.join(state_directory, ELIGIBILITY_CACHE_FILE),
+                                                  program_config.get("eligibility_ttl", 86400), log)
+        self.session_store = SessionStore(os.path.join(state_directory, SESSION_STORE_FILE), log)
+        self.checkpoint = Checkpoint(os.path.join(state_directory, CHECKPOINT_FILE), log)
+        self.last_notification_hash = ""
 
         self.username = login_credentials["username"]
         self.password = login_credentials["password"]
         self.logged_in = False
         self.notification_update_msg = ""
         self.has_slots_reserved = False
+        self.slot_grids = {}
+        self.dashboard = None
+        self.grid_headers = {}
+        self.team_available_sessions = {}  # other OneTeam name -> its available practical sessions this cycle
+        self.grid_history = {}  # field type -> recent AvailabilityGrid scans, kept across cycles
+        self.availability_grids = {}  # field type -> this cycle's AvailabilityGrid
+
+        # Fingerprints of the tables parsed last cycle, kept across cycles to skip types whose page did not change
+        self.table_fingerprints = {}
+        self.last_dashboard = None
+        self.dashboard_unchanged = False
+        self.fast_path_counts = Counter()
+        self.page_cache = {}  # booking page path -> what its load this cycle found
+        self.page_latency = LatencyMetrics()  # time until each navigation was ready, kept across cycles
+        self.click_latency = LatencyMetrics()  # time until each slot click was confirmed, kept across cycles
+        self.login_latency = LatencyMetrics()  # reCAPTCHA time waited on and saved by solving it in the background
+        self.page_ready_at = time.perf_counter()
+        self.keep_alive = KeepAlive(program_config.get("session_timeout", 1200))  # paces and tallies session pings
 
         self.platform = "linux" if "linux" in sys.platform else "windows" if "win32" in sys.platform else "osx"
 
@@ -63,83 +117,93 @@ class handler(CDCAbstract):
             Types.PT: self.open_practical_test_booking_page,
         }
 
-        options = browser_type.lower() == "firefox" and webdriver.FirefoxOptions() or webdriver.ChromeOptions()
-        if headless:
-            options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--no-proxy-server")
-
-        driver_name = "geckodriver" if browser_type.lower() == "firefox" else "chromedriver"
-        if self.platform == "windows":
-            driver_name += ".exe"
-        executable_path = os.path.join("drivers", self.platform, driver_name)
-
-        if browser_type.lower() == "firefox":
-            self.driver = webdriver.Firefox(executable_path=executable_path, options=options)
-        else:
-            self.driver = webdriver.Chrome(executable_path=executable_path, options=options)
-
-        self.driver.set_window_size(1600, 768)
+        self.driver_manager = driver_manager  # lends a warm browser instead of starting one per handler
+        self.driver = driver or self._start_driver(browser_type, headless)
         super().__init__(username=self.username, password=self.password, headless=headless)
+        self.restore_checkpoint()
+
+    def _start_driver(self, browser_type: str, headless: bool):
+        if self.driver_manager:
+            return self.driver_manager.acquire()
+        return start_browser(browser_type, headless)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        self.driver.close()
+        if self.driver_manager:
+            self.driver_manager.release(self.driver)
+        else:
+            self.driver.quit()
+
+    def _open_index(self, path: str, ready_ids: tuple = ()):
+        with self.page_latency.measure(path.split("?")[0].rsplit("/", 1)[-1]):
+            self.driver.get(f"{self.booking_url}{self.port}/{path}")
+            selenium_common.wait_for_page_ready(self.driver, ready_ids)
+        self.page_ready_at = time.perf_counter()
 
-    def _open_index(self, path: str, sleep_delay=None):
-        self.driver.get(f"{self.booking_url}{self.port}/{path}")
-        if sleep_delay:
-            time.sleep(sleep_delay)
+    def wait_for_page_ready(self, page_name: str, ready_ids: tuple = ()):
+        with self.page_latency.measure(page_name):
+            is_ready = selenium_common.wait_for_page_ready(self.driver, ready_ids)
+        self.page_ready_at = time.perf_counter()
+        return is_ready
+
+    def wait_for_course_postback(self, page_name: str):
+        # Selecting a course only queues its AutoPostBack, the old page still reads as loaded until the new one with
+        # the captcha (or straight away the grid) replaces it
+        return self.wait_for_page_ready(page_name, (CAPTCHA_IMG_ID, SLOT_GRID_TABLE_ID, FULL_BOOK_MSG_ID))
 
     def __str__(self):
         return super().__str__()
 
-    def reset_state(self):
-        self.reset_attributes_for_all_fieldtypes()
-        self.notification_update_msg = ""
-        self.has_slots_reserved = False
-
-    def is_date_in_view(self, date_str: str, field_type: str):
-        return date_str in self.get_attribute_with_fieldtype("days_in_view", field_type)
+    def get_current_url(self):
+        return self.driver.current_url
 
-    def get_earliest_time_slots(self, sessions_data: Dict, length: int, field_type: str):
-        sorted_datetimes = [(date_str, time_slot) for date_str, time_slots in sessions_data.items()
-                            for time_slot in time_slots]
-        sorted_datetimes.sort(key=lambda comp_date: convert_to_datetime(comp_date[0], comp_date[1]))
+    def get_page_state(self) -> AspNetPage:
+        return parse_aspnet_page(self.driver.page_source, self.get_current_url())
 
-        return_sessions_data = {}
-        step = 2 if field_type == Types.SIMULATOR else 1  # No back-to-back sessions allowed for simulator lessons
+    def get_session_identity(self):
+        # Login cookies and user agent, so plain HTTP clients are seen as this browser session
+        return self.driver.get_cookies(), self.driver.execute_script("return navigator.userAgent;")
 
-        for i in range(0, min(length * step, len(sorted_datetimes)), step):
-            selected_date_str, selected_time_slot = sorted_datetimes[i]
+    def dismiss_alert(self, timeout: int = 2):
+        return selenium_common.dismiss_alert(driver=self.driver, timeout=timeout)
 
-            if selected_date_str not in return_sessions_data:
-                return_sessions_data[selected_date_str] = [selected_time_slot]
-            else:
-                return_sessions_data[selected_date_str].append(selected_time_slot)
+    def probe_elems(self, element_ids: List[str]) -> Dict[str, bool]:
+        return selenium_common.probe_elems(self.driver, element_ids)
 
-        return return_sessions_data
+    def get_elem_text(self, element_id: str):
+        return selenium_common.wait_for_elem(self.driver, By.ID, element_id).text
 
-    def check_if_same_sessions(self, session0: Dict, session1: Dict):
-        for date_str, time_slots in session0.items():
-            if date_str not in session1:
-                return True
+    def click_slot(self, element_id: str):
+        selenium_common.wait_for_elem(self.driver, By.ID, element_id).click()
 
-            for time_slot in time_slots:
-                if time_slot not in session1[date_str]:
-                    return True
+    def confirm_slot_click(self, element_id: str, expected_state: str, timeout: int = 10):
+        # Same result as dismiss_alert, but also returns as soon as the clicked cell shows the expected state.
+        # alert_found is None when neither happened, the click may or may not have gone through
+        with self.click_latency.measure(f"{expected_state} confirmation"):
+            return selenium_common.wait_for_alert_or_image(self.driver, element_id, slot_image_names[expected_state],
+                                                           timeout=timeout)
 
-        for date_str, time_slots in session1.items():
-            if date_str not in session0:
-                return True
+    def reset_state(self):
+        self.reset_attributes_for_all_fieldtypes()
+        self.notification_update_msg = ""
+        self.has_slots_reserved = False
+        self.slot_grids = {}
+        self.availability_grids = {}
+        self.dashboard = None
+        self.grid_headers = {}
+        self.team_available_sessions = {}
+        self.dashboard_unchanged = False
+        self.page_cache = {}
+        self.planner.new_cycle()
 
-            for time_slot in time_slots:
-                if time_slot not in session0[date_str]:
-                    return True
+    def is_date_in_view(self, date_str: str, field_type: str):
+        return date_str in self.get_attribute_with_fieldtype("days_in_view", field_type)
 
-        return False
+    def check_if_same_sessions(self, session0: SlotSet, session1: SlotSet):
+        # Returns True if the sessions differ
+        return session0 != session1
 
     def check_call_depth(self, call_depth: int):
         if call_depth > 4:
@@ -150,15 +214,44 @@ class handler(CDCAbstract):
         return True
 
     def check_access_rights(self, webpage: str):
-        if "Alert.aspx" in self.driver.current_url:
+        if "Alert.aspx" in self.get_current_url():
             self.log.info(f"You do not have access to {webpage}.")
             return False
 
         return True
 
+    def ping_session(self):
+        # Returns whether the portal still knows the session (None if the ping itself failed) and the bytes it cost
+        keep_alive_url = f"{self.booking_url}{self.port}/{KEEP_ALIVE_PAGE}"
+        result = selenium_common.ping(self.driver, keep_alive_url)
+        if not result or not result[0]:
+            return None, 0
+
+        status, final_url, header_bytes = result
+        return status == 200 and self.port in final_url, header_bytes
+
+    def is_session_alive(self):
+        # One real page load, the portal sends an expired session to its login page
+        self._open_index(KEEP_ALIVE_PAGE)
+        return self.port in self.get_current_url()
+
     def check_logged_in(self):
-        self._open_index("NewPortal/Booking/StatementBooking.aspx")
-        if self.port not in self.driver.current_url:
+        # Any page (or the last ping) refreshed the session, the time since then is how long it sat idle
+        idle_seconds = time.perf_counter() - max(self.page_ready_at, self.keep_alive.last_ping_at)
+        t_start = time.perf_counter()
+        alive, num_bytes = self.ping_session()
+        ping_seconds = time.perf_counter() - t_start
+
+        # A re-login costs a reCAPTCHA, so an expired answer is confirmed with a page load first. A failed ping says
+        # nothing about the session and is kept out of the timeout estimate
+        confirmed_alive = alive or self.is_session_alive()
+        self.keep_alive.record(None if alive is None else confirmed_alive, num_bytes, ping_seconds, idle_seconds)
+        if alive is None:
+            self.log.warning(f"Session keep-alive ping failed, session alive: {confirmed_alive}.")
+
+        if not confirmed_alive:
+            # A fresh token is being solved while logging out and reloading the home page
+            self.captcha_solver.prefetch_recaptcha()
             self.log.info("User has been timed out! Now logging out and in again...")
             self.account_logout()
             self.account_login()
@@ -166,9 +259,7 @@ class handler(CDCAbstract):
 
     def dismiss_normal_captcha(self, caller_identifier: str, solve_captcha: bool = False,
                                secondary_alert_timeout: int = 5, force_enabled: bool = False):
-        is_captcha_present = selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_CaptchaImg",
-                                                             timeout=5)
-        if not is_captcha_present:
+        if CAPTCHA_IMG_ID not in self.probe_elems([CAPTCHA_IMG_ID]):
             return True
 
         if solve_captcha:
@@ -184,21 +275,21 @@ class handler(CDCAbstract):
             captcha_close_btn.click()
 
         # dismiss alert if found
-        _, alert_text = selenium_common.dismiss_alert(driver=self.driver, timeout=2)
+        _, alert_text = self.dismiss_alert(timeout=2)
+        if solve_captcha:
+            self.captcha_solver.report_captcha_result(correct="incorrect captcha" not in alert_text)
         if "incorrect captcha" in alert_text:
-            selenium_common.dismiss_alert(driver=self.driver, timeout=secondary_alert_timeout)
+            self.dismiss_alert(timeout=secondary_alert_timeout)
             self.log.info(f"Normal captcha failed for opening {caller_identifier} page.")
             return False
 
         return True
 
     def accept_terms_and_conditions(self):
-        terms_checkbox = selenium_common.is_elem_present(self.driver, By.ID,
-                                                         "ctl00_ContentPlaceHolder1_chkTermsAndCond")
-        agree_btn = selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_btnAgreeTerms")
-        if terms_checkbox and agree_btn:
-            terms_checkbox.click()
-            agree_btn.click()
+        terms_ids = ["ctl00_ContentPlaceHolder1_chkTermsAndCond", "ctl00_ContentPlaceHolder1_btnAgreeTerms"]
+        if all(terms_id in self.probe_elems(terms_ids) for terms_id in terms_ids):
+            for terms_id in terms_ids:
+                selenium_common.wait_for_elem(self.driver, By.ID, terms_id).click()
 
     def get_course_data(self, course_element_id: Union[str, None] = None):
         course = selenium_common.is_elem_present(self.driver, By.ID, course_element_id or
@@ -234,15 +325,37 @@ class handler(CDCAbstract):
         course_data["course_selection"].select_by_index(course_idx)
         return course_data["available_courses"][course_idx]
 
-    def open_home_page(self, sleep_delay: Union[int, None] = None):
-        self.driver.get(self.home_url)
+    def open_home_page(self):
+        with self.page_latency.measure("home"):
+            self.driver.get(self.home_url)
+            selenium_common.wait_for_page_ready(self.driver)
         assert "ComfortDelGro" in self.driver.title
 
-        if sleep_delay:
-            time.sleep(sleep_delay)
+    def start_recaptcha_solve(self):
+        # The sitekey is in the home page as soon as it loads, so the solve can run while the form is filled in
+        site_key = self.driver.execute_script(selenium_common.RECAPTCHA_SITE_KEY_SCRIPT)
+        if not (site_key and self.captcha_solver.enabled):
+            return None
+        return self.captcha_solver.start_recaptcha(site_key, self.get_current_url())
+
+    def finish_recaptcha_solve(self, recaptcha_solve):
+        if recaptcha_solve is None:
+            return self.captcha_solver.solve(driver=self.driver, captcha_type="recaptcha_v2")[0]
+
+        success, status, token = recaptcha_solve.wait()
+        self.login_latency.record("reCAPTCHA wait", recaptcha_solve.waited)
+        self.login_latency.record("reCAPTCHA time saved", recaptcha_solve.time_saved)
+        if not success:
+            self.log.info(f"reCAPTCHA solve failed: {status}: {token}")
+            return False
+
+        self.log.info(f"reCAPTCHA token ready, {recaptcha_solve.time_saved:.1f}s of the solve overlapped the login.")
+        self.driver.execute_script(selenium_common.RECAPTCHA_RESPONSE_SCRIPT, token)
+        return True
 
     def account_login(self):
-        self.open_home_page(sleep_delay=2)
+        self.open_home_page()
+        recaptcha_solve = self.start_recaptcha_solve()
 
         prompt_login_btn = selenium_common.wait_for_elem(self.driver, By.XPATH, "//*[@id='top-menu']/ul/li[10]/a")
         prompt_login_btn.click()
@@ -253,12 +366,14 @@ class handler(CDCAbstract):
         learner_id_input.send_keys(self.username)
         password_input.send_keys(self.password)
 
-        success, _ = self.captcha_solver.solve(driver=self.driver, captcha_type="recaptcha_v2")
+        success = self.finish_recaptcha_solve(recaptcha_solve)
         if success:
             login_btn = selenium_common.wait_for_elem(self.driver, By.ID, "BTNSERVICE2")
             login_btn.click()
 
-            _, alert_text = selenium_common.dismiss_alert(driver=self.driver, timeout=5)
+            _, alert_text = self.dismiss_alert(timeout=5)
+            self.captcha_solver.report_captcha_result(correct="complete the captcha" not in alert_text,
+                                                      captcha_type="recaptcha_v2")
             if "complete the captcha" in alert_text:
                 self.log.info("Wrong captcha given.")
                 self.account_logout()
@@ -269,6 +384,7 @@ class handler(CDCAbstract):
                 if len(url_digits) > 0:
                     self.port = str(url_digits[-1])
                     self.logged_in = True
+                    self.save_session()
                     return True
                 else:
                     self.account_logout()
@@ -279,107 +395,139 @@ class handler(CDCAbstract):
         self._open_index("NewPortal/logOut.aspx?PageName=Logout")
         self.log.info("Logged out.")
         self.logged_in = False
+        self.session_store.clear(self.username)
+
+    def save_session(self):
+        cookies, user_agent = self.get_session_identity()
+        self.session_store.set(self.username, self.password,
+                               {"cookies": cookies, "user_agent": user_agent, "port": self.port})
+
+    def restore_session(self, session: Dict):
+        self.driver.get(f"{self.booking_url}{session['port']}/{SESSION_PRIMER_PATH}")
+        for cookie in session["cookies"]:
+            self.driver.add_cookie({key: int(value) if key == "expiry" else value for key, value in cookie.items()
+                                    if key in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry")})
+
+    def resume_session(self):
+        # Reuses the session stored by the last login, validated with one page load; False means a full login is due
+        session = self.session_store.get(self.username, self.password)
+        if not session:
+            return False
+
+        self.port = session["port"]
+        self.restore_session(session)
+        if not self.is_session_alive():
+            self.log.info("Stored session was rejected by the portal, logging in again.")
+            self.session_store.clear(self.username)
+            self.port = ""
+            return False
+
+        self.logged_in = True
+        self.log.info("Resumed the stored session, login skipped.")
+        return True
 
     def open_booking_overview(self):
         self.check_logged_in()
         self._open_index("NewPortal/Booking/Dashboard.aspx")
-        selenium_common.dismiss_alert(driver=self.driver, timeout=5)
+        self.dismiss_alert(timeout=5)
+        self.read_dashboard()
+
+    def fetch_dashboard_html(self):
+        return self.driver.execute_script(DASHBOARD_SCRIPT)
+
+    def read_dashboard(self):
+        tables_html = self.fetch_dashboard_html()
+        self.dashboard_unchanged = self.update_table_fingerprint("dashboard", tables_html)
+
+        if not (self.dashboard_unchanged and self.last_dashboard):
+            self.last_dashboard = parse_dashboard(tables_html)
+        self.dashboard = self.last_dashboard
+        return self.dashboard
+
+    def update_table_fingerprint(self, key: str, table_html: str):
+        fingerprint = hashlib.blake2b(table_html.encode(), digest_size=16).digest()
+        unchanged = self.table_fingerprints.get(key) == fingerprint
+        self.table_fingerprints[key] = fingerprint
+        return unchanged
+
+    def is_grid_unchanged(self, field_type: str):
+        # Same slot grid and Dashboard as last cycle means the parse/decide/notify pipeline would find nothing new
+        table_html = self.fetch_slot_grid_html()
+        unchanged = self.update_table_fingerprint(field_type, table_html) and self.dashboard_unchanged
+        if not unchanged:
+            # Parsed once for the rest of the cycle, the grid readers after this don't fetch it again
+            self.slot_grids[field_type] = parse_slot_grid(table_html, field_type)
+        self.fast_path_counts["scans"] += 1
+        if unchanged:
+            self.fast_path_counts["hits"] += 1
+            self.log.info(
+                f"{field_type.upper()} sessions unchanged since last check, skipping. Fast path hit "
+                f"{self.fast_path_counts['hits']}/{self.fast_path_counts['scans']} scans "
+                f"({self.fast_path_counts['hits'] / self.fast_path_counts['scans']:.0%}).")
+        return unchanged
 
     def get_reserved_lesson_date_time(self):
-        rows = self.driver.find_elements(By.CSS_SELECTOR, "table#ctl00_ContentPlaceHolder1_gvReserved tr")
-
-        for row in rows:
-            td_cells = row.find_elements(By.TAG_NAME, "td")
-            if len(td_cells) > 0:
-                lesson_name = td_cells[4].text
-
-                field_type = (
-                    Types.SIMULATOR if "SIMULATOR" in lesson_name else
-                    Types.PRACTICAL if "AUTOCAR" in lesson_name else
-                    Types.PRACTICAL if "2BL" in lesson_name else
-                    Types.PRACTICAL if "ONETEAM" in lesson_name else
-                    Types.BTT if "BTT" in lesson_name else
-                    Types.RTT if "RTT" in lesson_name else
-                    Types.FTT if "FTT" in lesson_name else
-                    Types.PT if "PT" in lesson_name else
-                    None
-                )
+        dashboard = self.dashboard or self.read_dashboard()
 
-                if field_type and field_type != Types.PRACTICAL:
-                    self.set_attribute_with_fieldtype("lesson_name", field_type, lesson_name)
-                    reserved_sessions = self.get_attribute_with_fieldtype("reserved_sessions", field_type)
+        for field_type, lessons in dashboard.reserved.items():
+            if field_type == Types.PRACTICAL:
+                continue
 
-                    if td_cells[0].text not in reserved_sessions:
-                        reserved_sessions.update(
-                            {td_cells[0].text: [f"{td_cells[2].text[:-3]} - {td_cells[3].text[:-3]}"]})
-                    else:
-                        reserved_sessions[td_cells[0].text].append(f"{td_cells[2].text[:-3]} - {td_cells[3].text[:-3]}")
+            reserved_sessions = self.get_attribute_with_fieldtype("reserved_sessions", field_type)
+            for lesson in lessons:
+                self.set_attribute_with_fieldtype("lesson_name", field_type, lesson.lesson_name)
+                reserved_sessions.add(lesson.date_str, lesson.time_slot)
 
     def get_booked_lesson_date_time(self):
-        rows = self.driver.find_elements(By.CSS_SELECTOR, "table#ctl00_ContentPlaceHolder1_gvBooked tr")
-
-        for row in rows:
-            td_cells = row.find_elements(By.TAG_NAME, "td")
-            if len(td_cells) > 0:
-                lesson_name = td_cells[4].text
-
-                field_type = (
-                    Types.SIMULATOR if "SIMULATOR" in lesson_name else
-                    Types.PRACTICAL if "AUTOCAR" in lesson_name else
-                    Types.PRACTICAL if "2BL" in lesson_name else
-                    Types.PRACTICAL if "ONETEAM" in lesson_name else
-                    Types.BTT if "BTT" in lesson_name else
-                    Types.RTT if "RTT" in lesson_name else
-                    Types.FTT if "FTT" in lesson_name else
-                    Types.PT if "PT" in lesson_name else
-                    None
-                )
-
-                if field_type:
-                    self.set_attribute_with_fieldtype("lesson_name", field_type, lesson_name)
-                    booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
+        dashboard = self.dashboard or self.read_dashboard()
 
-                    if td_cells[0].text not in booked_sessions:
-                        booked_sessions.update(
-                            {td_cells[0].text: [f"{td_cells[2].text[:-3]} - {td_cells[3].text[:-3]}"]})
-                    else:
-                        booked_sessions[td_cells[0].text].append(f"{td_cells[2].text[:-3]} - {td_cells[3].text[:-3]}")
+        for field_type, lessons in dashboard.booked.items():
+            booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
+            for lesson in lessons:
+                self.set_attribute_with_fieldtype("lesson_name", field_type, lesson.lesson_name)
+                booked_sessions.add(lesson.date_str, lesson.time_slot)
 
     def open_field_type_booking_page(self, field_type: str):
         return self.opening_booking_page_callback_map[field_type](field_type)
 
     def open_theory_test_booking_page(self, field_type: str, call_depth: int = 0):
+        # BTT, RTT and FTT share one page that only ever offers one test, so it is loaded once per cycle. It is only
+        # reloaded when its test is wanted after another page was opened in between.
+        offered_type = self.page_cache.get(THEORY_TEST_PAGE, "")
+        if THEORY_TEST_PAGE not in self.page_cache or (
+                offered_type == field_type and not self.get_current_url().endswith(THEORY_TEST_PAGE)):
+            offered_type = self.load_theory_test_booking_page(field_type, call_depth)
+            self.page_cache[THEORY_TEST_PAGE] = offered_type
+        else:
+            self.log.debug(f"Reusing this cycle's theory test page for {field_type.upper()}.")
+
+        return offered_type == field_type
+
+    def load_theory_test_booking_page(self, field_type: str, call_depth: int = 0) -> Union[str, None]:
         if not self.check_call_depth(call_depth):
             call_depth = 0
-        self._open_index("NewPortal/Booking/BookingTT.aspx", sleep_delay=1)
+        self._open_index(THEORY_TEST_PAGE)
 
-        if not self.check_access_rights("NewPortal/Booking/BookingTT.aspx"):
-            self.log.debug(f"User does not have {field_type.upper()} as an available option.")
-            return False
+        if not self.check_access_rights(THEORY_TEST_PAGE):
+            self.log.debug("User does not have theory tests as an available option.")
+            return None
 
         if not self.dismiss_normal_captcha(caller_identifier=f"{field_type.upper()} Booking", solve_captcha=False):
-            return self.open_theory_test_booking_page(field_type, call_depth + 1)
+            return self.load_theory_test_booking_page(field_type, call_depth + 1)
 
-        time.sleep(0.5)
         self.accept_terms_and_conditions()
 
-        if selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_lblFullBookMsg"):
-            self.log.info(f"No available {field_type.upper()} sessions currently.")
-            return False
+        if FULL_BOOK_MSG_ID in self.probe_elems([FULL_BOOK_MSG_ID]):
+            self.log.info("No available theory test sessions currently.")
+            return None
 
-        test_name_element = selenium_common.wait_for_elem(self.driver, By.ID,
-                                                          "ctl00_ContentPlaceHolder1_lblResAsmBlyDesc")
-        test_name = test_name_element.text
-        return (
-                (field_type == Types.BTT and "Basic Theory Test" in test_name)
-                or (field_type == Types.RTT and "Riding Theory Test" in test_name)
-                or (field_type == Types.FTT and "Final Theory Test" in test_name)
-        )
+        test_name = self.get_elem_text("ctl00_ContentPlaceHolder1_lblResAsmBlyDesc")
+        return next((test_type for name, test_type in theory_test_names.items() if name in test_name), None)
 
     def open_practical_lessons_booking_page(self, field_type: str, call_depth: int = 0):
         if not self.check_call_depth(call_depth):
             call_depth = 0
-        self._open_index("NewPortal/Booking/BookingPL.aspx", sleep_delay=1)
+        self._open_index("NewPortal/Booking/BookingPL.aspx")
 
         if not self.check_access_rights("NewPortal/Booking/BookingPL.aspx"):
             self.log.debug(f"User does not have {field_type.upper()} as an available option.")
@@ -399,61 +547,53 @@ class handler(CDCAbstract):
             self.log.warning("Could not a select course.")
             return False
 
+        self.wait_for_course_postback("BookingPL.aspx course")
         if not self.dismiss_normal_captcha(caller_identifier="Practical Lessons Booking", solve_captcha=True):
             return self.open_practical_lessons_booking_page(field_type, call_depth + 1)
 
-        time.sleep(2)
-        if selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_lblFullBookMsg"):
+        self.wait_for_page_ready("BookingPL.aspx grid", (SLOT_GRID_TABLE_ID, FULL_BOOK_MSG_ID))
+        page_elems = self.probe_elems([FULL_BOOK_MSG_ID, OTHER_TEAM_SELECT_ID])
+        if FULL_BOOK_MSG_ID in page_elems:
             self.log.info("No available practical lessons currently.")
             self.notification_manager.send_notification_all(title="", msg="No available practical lessons currently")
             return False
 
         # Check if the user is able to book from other teams
-        if selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_ddlOthTeamID"):
-            available_teams = self.get_course_data("ctl00_ContentPlaceHolder1_ddlOthTeamID")
+        if OTHER_TEAM_SELECT_ID in page_elems:
+            available_teams = self.get_course_data(OTHER_TEAM_SELECT_ID)
 
             if self.program_config["book_from_other_teams"] and len(available_teams["available_courses"]) > 1:
-                self.get_all_session_date_times(Types.PRACTICAL)
-                self.get_all_available_sessions(Types.PRACTICAL)
-
-                available_teams_str = ""
-
-                for idx in range(1, len(available_teams["available_courses"])):
-                    available_teams = self.get_course_data("ctl00_ContentPlaceHolder1_ddlOthTeamID")
-                    if len(available_teams["available_courses"]) > idx:
-                        selected_team = self.select_course_from_idx(available_teams, idx)
-                        available_teams_str += "=======================\n"
-                        available_teams_str += f"{selected_team} has slots:\n\n"
-                        time.sleep(1)
-
-                        loading_element = selenium_common.wait_for_elem(self.driver, By.ID,
-                                                                        "ctl00_ContentPlaceHolder1_UpdateProgress1")
-                        while loading_element.is_displayed():
-                            time.sleep(0.5)
-
-                        team_available_sessions = {}
-                        self.get_all_available_sessions(Types.PRACTICAL, team_available_sessions)
-
-                        for available_date_str, available_time_slots in team_available_sessions.items():
-                            available_teams_str += f"{available_date_str}:\n"
-                            for time_slot in available_time_slots:
-                                available_teams_str += f"  -> {time_slot}\n"
-                        available_teams_str += "=======================\n"
-
-                        self.get_all_session_date_times(Types.PRACTICAL)
-                        self.get_all_available_sessions(Types.PRACTICAL)
-
-                self.notification_manager.send_notification_all(
-                    title=f"SESSIONS FROM OTHER TEAMS DETECTED",
-                    msg=available_teams_str
-                )
+                self.scan_other_teams()
 
         return True
 
+    def scan_other_teams(self):
+        # Every other team's grid is fetched at once off the current page state, the browser stays on the home team
+        cookies, user_agent = self.get_session_identity()
+        team_scanner = TeamScanner(cookies, user_agent, self.log)
+        with self.page_latency.measure("other teams scan"):
+            self.team_available_sessions = team_scanner.scan(self.get_page_state(), OTHER_TEAM_SELECT_ID,
+                                                             Types.PRACTICAL)
+
+        available_teams_str = ""
+        for team_name, team_sessions in self.team_available_sessions.items():
+            available_teams_str += "=======================\n"
+            available_teams_str += f"{team_name} has slots:\n\n"
+            for available_date_str, available_time_slots in team_sessions.items():
+                available_teams_str += f"{available_date_str}:\n"
+                for time_slot in available_time_slots:
+                    available_teams_str += f"  -> {time_slot}\n"
+            available_teams_str += "=======================\n"
+
+        self.notification_manager.send_notification_all(
+            title=f"SESSIONS FROM OTHER TEAMS DETECTED",
+            msg=available_teams_str
+        )
+
     def open_simulator_lessons_booking_page(self, field_type: str, call_depth: int = 0):
         if not self.check_call_depth(call_depth):
             call_depth = 0
-        self._open_index("NewPortal/Booking/BookingSimulator.aspx", sleep_delay=1)
+        self._open_index("NewPortal/Booking/BookingSimulator.aspx")
 
         if not self.check_access_rights("NewPortal/Booking/BookingSimulator.aspx"):
             self.log.debug(f"User does not have {field_type.upper()} as an available option.")
@@ -473,11 +613,12 @@ class handler(CDCAbstract):
             self.log.warning("Could not a select course.")
             return False
 
+        self.wait_for_course_postback("BookingSimulator.aspx course")
         if not self.dismiss_normal_captcha(caller_identifier="Simulator Lessons Booking", solve_captcha=True):
             return self.open_simulator_lessons_booking_page(field_type, call_depth + 1)
 
-        time.sleep(2)
-        if selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_lblFullBookMsg"):
+        self.wait_for_page_ready("BookingSimulator.aspx grid", (SLOT_GRID_TABLE_ID, FULL_BOOK_MSG_ID))
+        if FULL_BOOK_MSG_ID in self.probe_elems([FULL_BOOK_MSG_ID]):
             self.log.info("No available simulator lessons currently.")
             return False
 
@@ -490,7 +631,7 @@ class handler(CDCAbstract):
 
         if not self.check_call_depth(call_depth):
             call_depth = 0
-        self._open_index("NewPortal/Booking/BookingPT.aspx", sleep_delay=1)
+        self._open_index("NewPortal/Booking/BookingPT.aspx")
 
         if not self.check_access_rights("NewPortal/Booking/BookingPT.aspx"):
             self.log.debug(f"User does not have {field_type.upper()} as an available option.")
@@ -499,107 +640,188 @@ class handler(CDCAbstract):
         if not self.dismiss_normal_captcha(caller_identifier="Practical Test Booking", solve_captcha=True):
             return self.open_practical_test_booking_page(field_type, call_depth + 1)
 
-        time.sleep(0.5)
         self.accept_terms_and_conditions()
 
-        if selenium_common.is_elem_present(self.driver, By.ID, "ctl00_ContentPlaceHolder1_lblFullBookMsg"):
+        if FULL_BOOK_MSG_ID in self.probe_elems([FULL_BOOK_MSG_ID]):
             self.log.info(f"No available {field_type.upper()} sessions currently.")
             return False
 
         return True
 
+    def fetch_slot_grid_html(self):
+        return self.driver.execute_script(SLOT_GRID_SCRIPT)
+
+    def read_slot_grid(self, field_type: str):
+        # The grid as first read this cycle, fetched and parsed only if nothing read it yet
+        if field_type not in self.slot_grids:
+            self.slot_grids[field_type] = parse_slot_grid(self.fetch_slot_grid_html(), field_type)
+        return self.slot_grids[field_type]
+
     def get_all_session_date_times(self, field_type: str):
-        for row in self.driver.find_elements(By.CSS_SELECTOR, "table#ctl00_ContentPlaceHolder1_gvLatestav tr"):
-            th_cells = row.find_elements(By.TAG_NAME, "th")
-
-            selected_times_array = self.get_attribute_with_fieldtype("times_in_view", field_type)
-            selected_days_array = self.get_attribute_with_fieldtype("days_in_view", field_type)
-
-            for i in range(2, len(th_cells)):
-                selected_time_str = str(th_cells[i].text).split("\n")[1]
-                if selected_time_str not in selected_times_array:
-                    selected_times_array.append(selected_time_str)
-
-            td_cells = row.find_elements(By.TAG_NAME, "td")
-            if td_cells:
-                selected_day_str = td_cells[0].text
-                if selected_day_str not in selected_days_array:
-                    selected_days_array.append(selected_day_str)
-
-    def get_all_available_sessions(self, field_type: str, local_tb: Dict = None):
-        input_elements = self.driver.find_elements(By.TAG_NAME, "input")
-        last_practical_input_element = None
-        has_booked_lessons_in_view = False
-
-        for input_element in input_elements:
-            # Images1.gif -> available slot
-            # Images2.gif -> reserved slot
-            # Images3.gif -> booked slot
-            input_element_src = input_element.get_attribute("src")
-            if any(gif in input_element_src for gif in ["Images1.gif", "Images2.gif", "Images3.gif"]):
-                # e.g. ctl00_ContentPlaceHolder1_gvLatestav_ctl02_btnSession4 (02 is row, 4 is column)
-                element_id = str(input_element.get_attribute("id"))
-                element_id_spliced = element_id.split('_')
-                # row = int(element_id_spliced[3][-2:]) - 2
-                column = int(element_id_spliced[-1][10:]) - 1
-
-                parent_table = input_element.find_element(By.XPATH, "../../..")
-                parent_row = input_element.find_element(By.XPATH, "../..")
-                td_cells = parent_row.find_elements(By.TAG_NAME, "td")
-
-                tr_rows = parent_table.find_elements(By.TAG_NAME, "tr")
-                th_cells = tr_rows[0].find_elements(By.TAG_NAME, "th")
-
-                available_session_date = td_cells[0].text
-                start_col = 4 if field_type == Types.SIMULATOR else 2
-                available_session_time = str(th_cells[column + start_col].text).split("\n")[1]
-
-                web_elements_in_view = {} if local_tb is not None else self.get_attribute_with_fieldtype(
-                    "web_elements_in_view", field_type)
-                web_element_key = f"{available_session_date} : {available_session_time}"
-                if web_element_key not in web_elements_in_view:
-                    web_elements_in_view.update({web_element_key: element_id})
-
-                if "Images1.gif" in input_element_src:
-                    available_sessions = local_tb if local_tb is not None else self.get_attribute_with_fieldtype(
-                        "available_sessions", field_type)
-
-                    last_practical_input_element = (
-                        input_element if field_type in [Types.PRACTICAL, Types.PT, Types.SIMULATOR] else None
-                    )
+        slot_grid = self.read_slot_grid(field_type)
+
+        selected_times_array = self.get_attribute_with_fieldtype("times_in_view", field_type)
+        selected_days_array = self.get_attribute_with_fieldtype("days_in_view", field_type)
+
+        for selected_time_str in slot_grid.times:
+            if selected_time_str not in selected_times_array:
+                selected_times_array.append(selected_time_str)
+
+        for selected_day_str in slot_grid.days:
+            if selected_day_str not in selected_days_array:
+                selected_days_array.append(selected_day_str)
+
+        self.grid_headers[field_type] = GridHeader.intern(selected_days_array, selected_times_array)
+
+    def get_all_available_sessions(self, field_type: str, local_tb: SlotSet = None):
+        slot_grid = self.read_slot_grid(field_type)
+        availability_grid = AvailabilityGrid.from_slot_grid(slot_grid, self.grid_headers.get(field_type))
+        last_practical_element_id = None
+        if local_tb is None:
+            self.availability_grids[field_type] = availability_grid
+
+        # Only while a reservation can be added without first freeing a later one
+        reserved_count = self.count_held_reservations(field_type) if local_tb is None else 0
+        earlier_mask = self.get_earlier_than_booked_mask(field_type, availability_grid)
+        reserve_first = (local_tb is None and self.reserve_first and self.auto_reserve
+                         and reserved_count < self.program_config["slots_per_type"][field_type]
+                         and bool(availability_grid.available & earlier_mask))
+        reserved_first = False
+
+        web_elements_in_view = {} if local_tb is not None else self.get_attribute_with_fieldtype(
+            "web_elements_in_view", field_type)
+        available_sessions = local_tb if local_tb is not None else self.get_attribute_with_fieldtype(
+            "available_sessions", field_type)
+
+        for slot_cell in slot_grid:
+            web_element_key = f"{slot_cell.date_str} : {slot_cell.time_str}"
+            if web_element_key not in web_elements_in_view:
+                web_elements_in_view.update({web_element_key: slot_cell.element_id})
+
+            if slot_cell.state == SlotState.AVAILABLE:
+                last_practical_element_id = (
+                    slot_cell.element_id if field_type in [Types.PRACTICAL, Types.PT, Types.SIMULATOR] else None
+                )
+
+                slot = parse_slot(slot_cell.date_str, slot_cell.time_str)
+                if reserve_first and availability_grid.cell_bit(slot_cell.date_str, slot_cell.time_str) & earlier_mask:
+                    reserve_first = False
+                    reserved_first = self.reserve_slot_first(field_type, slot, slot_cell.element_id)
+                    if reserved_first:
+                        continue
 
-                    if available_session_date not in available_sessions:
-                        available_sessions.update({available_session_date: [available_session_time]})
-                    elif available_session_time not in available_sessions[available_session_date]:
-                        available_sessions[available_session_date].append(available_session_time)
-                elif "Images2.gif" in input_element_src:
-                    pass
-                elif "Images3.gif" in input_element_src:
-                    has_booked_lessons_in_view = True
+                available_sessions.add_slot(slot)
+
+        if local_tb is None:
+            self.record_availability_grid(field_type, availability_grid)
+        has_booked_lessons_in_view = availability_grid.count(SlotState.BOOKED) > 0
 
         booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
-        if last_practical_input_element is None or has_booked_lessons_in_view or booked_sessions:
+        if last_practical_element_id is None or has_booked_lessons_in_view or booked_sessions or reserved_first:
+            return
+        if self.count_held_reservations(field_type):
+            # The portal took our reservations of this type, and with them held a probe could only hit the limit
+            return
+
+        # The probe below only has to run again once the TTL is up or something it depends on has changed
+        eligibility_key = self.get_eligibility_key()
+        can_book_next = self.eligibility_cache.get(self.username, field_type, eligibility_key)
+        if can_book_next is not None:
+            self.log.debug(f"Using cached eligibility for {field_type.upper()}: can book next = {can_book_next}")
+            self.set_attribute_with_fieldtype("can_book_next", field_type, can_book_next)
             return
 
         # check if sessions can be booked, else skip (e.g.
         # practical: no PDL for lesson 6
         # pt: simulator modules not done
         # simulator: 5th practical lesson not done)
-        last_practical_input_element_id = last_practical_input_element.get_attribute("id")
-        try:
-            self.log.info(f"Attempting to reserve a session to check if user can book {field_type.upper()}")
-            last_practical_input_element.click()
-            WebDriverWait(self.driver, 5).until(EC.alert_is_present())
-
-            alert = self.driver.switch_to.alert
-            self.log.warning(f"User can't book {field_type.upper()} because '{alert.text}'")
+        self.log.info(f"Attempting to reserve a session to check if user can book {field_type.upper()}")
+        self.click_slot(last_practical_element_id)
+
+        alert_found, alert_text = self.confirm_slot_click(last_practical_element_id, SlotState.RESERVED, timeout=5)
+        if alert_found is None:
+            # Not cached, the next cycle tries again and reads whatever the click did off the grid
+            self.log.warning(f"Could not confirm the {field_type.upper()} eligibility check: {alert_text}")
+            return
+        if alert_found:
+            self.log.warning(f"User can't book {field_type.upper()} because '{alert_text}'")
             self.set_attribute_with_fieldtype("can_book_next", field_type, False)
-            alert.accept()
-        except selenium_common.TimeoutException:
+        else:
             # if no alert, means user could book session. Now we have to unreserve it again.
-            self.driver.find_element(By.ID, last_practical_input_element_id).click()
-            self.log.info("Reverted reservation of session successfully")
-            time.sleep(2)
+            self.click_slot(last_practical_element_id)
+            reverted, alert_text = self.confirm_slot_click(last_practical_element_id, SlotState.AVAILABLE, timeout=5)
+            if reverted is False:
+                self.log.info("Reverted reservation of session successfully")
+            else:
+                self.log.warning(f"Could not confirm reverting the eligibility check reservation: {alert_text}")
+
+        self.eligibility_cache.set(self.username, field_type, eligibility_key, not alert_found)
+
+    def get_eligibility_key(self):
+        # Eligibility only changes with progress, i.e. the booked lessons on the Dashboard. Not the current lesson
+        # names, our own reservations change those
+        booked_lessons = sorted(
+            f"{lesson.date_str} {lesson.time_slot} {lesson.lesson_name}"
+            for lessons in (self.dashboard.booked.values() if self.dashboard else []) for lesson in lessons
+        )
+        return hashlib.blake2b("\n".join(booked_lessons).encode(), digest_size=16).hexdigest()
+
+    def is_earlier_than_booked(self, field_type: str, slot: Slot):
+        # A bit test against this cycle's grid, the rule itself only for slots outside its layout
+        availability_grid = self.availability_grids.get(field_type)
+        cell_bit = availability_grid.cell_bit(slot.date_str, slot.time_str) if availability_grid else 0
+        if cell_bit:
+            return bool(cell_bit & self.get_earlier_than_booked_mask(field_type, availability_grid))
+
+        booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
+        return self.earlier_than_booked.allows(slot, booked_sessions, [])
+
+    def count_held_reservations(self, field_type: str) -> int:
+        # The Dashboard reservations are not read for every type, the grid shows ours (as of when it was read)
+        availability_grid = self.availability_grids.get(field_type)
+        return max(len(self.get_attribute_with_fieldtype("reserved_sessions", field_type)),
+                   availability_grid.count(SlotState.RESERVED) if availability_grid else 0)
+
+    def get_earlier_than_booked_mask(self, field_type: str, availability_grid: AvailabilityGrid) -> int:
+        # The cells EarlierThanBooked allows: the days before the last booked one, that day too with
+        # reserve_for_same_day (every other booked day is before it). Every cell while nothing is booked
+        booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
+        if not booked_sessions:
+            return -1
+        return availability_grid.earlier_than_mask(booked_sessions.last().date, inclusive=self.reserve_for_same_day)
+
+    def reserve_slot_first(self, field_type: str, slot: Slot, element_id: str):
+        # Contested slots go to whoever clicks first, so this one is reserved before the rest of the grid is sorted
+        # out by check_if_earlier_available_sessions
+        self.click_slot(element_id)
+        ready_to_click = time.perf_counter() - self.page_ready_at
+        self.click_latency.record("page ready to reserve-first click", ready_to_click)
+
+        alert_found, alert_text = self.confirm_slot_click(element_id, SlotState.RESERVED)
+        if alert_found and "non-computerised" in alert_text:
+            alert_found, alert_text = self.confirm_slot_click(element_id, SlotState.RESERVED)
+
+        if alert_found is None:
+            self.log.warning(f"Could not confirm reserving-first a {field_type.upper()} slot on {slot.date_str} : "
+                             f"{slot.time_str}: {alert_text}")
+            return False
+        if alert_found:
+            self.log.error(f"Failed to reserve-first a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}. "
+                           f"Reason: {alert_text}")
+            return False
+
+        self.log.info(f"Reserved-first a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}, "
+                      f"{ready_to_click:.2f}s after the page was ready.")
+        self.get_attribute_with_fieldtype("reserved_sessions", field_type).add_slot(slot)
+        return True
+
+    def record_availability_grid(self, field_type: str, availability_grid: AvailabilityGrid):
+        history = self.grid_history.setdefault(field_type, deque(maxlen=GRID_HISTORY_LENGTH))
+        if history:
+            newly_available, taken = availability_grid.changes_since(history[-1])
+            self.log.debug(f"{field_type.upper()} grid since last scan: {bin(newly_available).count('1')} newly "
+                           f"available, {bin(taken).count('1')} taken, {availability_grid.count()} free.")
+        history.append(availability_grid)
 
     def create_notification_update(self, field_type: str):
         earlier_sessions = self.get_attribute_with_fieldtype("earlier_sessions", field_type)
@@ -625,8 +847,9 @@ class handler(CDCAbstract):
         for reserved_date_str, reserved_time_slots in reserved_sessions.items():
             notif_msg += f"{reserved_date_str}:\n"
             for time_slot in reserved_time_slots:
-                self.has_slots_reserved = True
                 notif_msg += f"  -> {time_slot}\n"
+        if reserved_sessions:
+            self.has_slots_reserved = True
         notif_msg += "--------------------------\n\n"
 
         notif_msg += "Available sessions:\n"
@@ -643,41 +866,65 @@ class handler(CDCAbstract):
 
     def update_earlier_sessions(self, field_type: str):
         available_sessions = self.get_attribute_with_fieldtype("available_sessions", field_type)
-
         booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
-        earlier_sessions = {}
-
-        if len(booked_sessions.keys()) > 0:
-            for available_date_str, available_time_slots in available_sessions.items():
-                available_date = convert_to_datetime(available_date_str)
 
-                for booked_date_str in booked_sessions:
-                    booked_date = convert_to_datetime(booked_date_str)
-
-                    valid_booked_date = (available_date < booked_date) or (
-                            self.reserve_for_same_day and available_date == booked_date)
-                    if valid_booked_date and available_date_str not in earlier_sessions:
-                        earlier_sessions[available_date_str] = list(available_time_slots)
-
-            self.set_attribute_with_fieldtype("earlier_sessions", field_type, dict(earlier_sessions))
+        if booked_sessions:
+            earlier_sessions = SlotSet(slot for slot in available_sessions
+                                       if self.is_earlier_than_booked(field_type, slot))
+            self.set_attribute_with_fieldtype("earlier_sessions", field_type, earlier_sessions)
         else:
-            self.set_attribute_with_fieldtype("earlier_sessions", field_type, dict(available_sessions))
+            self.set_attribute_with_fieldtype("earlier_sessions", field_type, available_sessions.copy())
 
     def flush_notification_update(self):
         if self.notification_update_msg != "":
-            self.notification_manager.send_notification_all(
-                title=f"{datetime.datetime.now()}",
-                msg=self.notification_update_msg
-            )
-
-            if self.has_slots_reserved:
+            notification_hash = hashlib.blake2b(self.notification_update_msg.encode(), digest_size=16).hexdigest()
+            if notification_hash == self.last_notification_hash:
+                self.log.info("Update is the same as the last one sent, not sending it again.")
+            else:
                 self.notification_manager.send_notification_all(
-                    title=f"RESERVED SLOTS DETECTED",
-                    msg="You have outstanding slots reserved! "
-                        "Please log in to the website and confirm these reservations else they will be forfeited."
+                    title=f"{datetime.datetime.now()}",
+                    msg=self.notification_update_msg
                 )
+
+                if self.has_slots_reserved:
+                    self.notification_manager.send_notification_all(
+                        title=f"RESERVED SLOTS DETECTED",
+                        msg="You have outstanding slots reserved! "
+                            "Please log in to the website and confirm these reservations else they will be forfeited."
+                    )
+                self.last_notification_hash = notification_hash
+
+        self.save_checkpoint()
         self.reset_state()
 
+    def save_checkpoint(self):
+        # Written once a cycle is complete, so a crash mid-cycle resumes from the last consistent state
+        self.checkpoint.set(self.username, {
+            "cached_earlier_sessions": {
+                getattr(Types, field_type): self.get_attribute_with_fieldtype(
+                    "cached_earlier_sessions", getattr(Types, field_type)).to_dict()
+                for field_type in field_types
+            },
+            "table_fingerprints": {key: fingerprint.hex() for key, fingerprint in self.table_fingerprints.items()},
+            "notification_hash": self.last_notification_hash,
+            "learned_rules": self.planner.get_learned_state(),
+        })
+
+    def restore_checkpoint(self):
+        state = self.checkpoint.get(self.username)
+        if not state:
+            return False
+
+        for field_type, sessions in state["cached_earlier_sessions"].items():
+            self.set_attribute_with_fieldtype("cached_earlier_sessions", field_type, SlotSet.from_dict(sessions))
+        self.table_fingerprints = {key: bytes.fromhex(fingerprint)
+                                   for key, fingerprint in state["table_fingerprints"].items()}
+        self.last_notification_hash = state["notification_hash"]
+        self.planner.load_learned_state(state["learned_rules"])
+
+        self.log.info("Restored the state checkpointed by the last run.")
+        return True
+
     def check_if_earlier_available_sessions(self, field_type: str):
         self.update_earlier_sessions(field_type)
 
@@ -693,94 +940,87 @@ class handler(CDCAbstract):
 
         number_of_slots_needed = self.program_config["slots_per_type"][field_type]
         if self.auto_reserve and number_of_slots_needed > 0:
-            earliest_sessions_to_be_reserved = self.get_earliest_time_slots(earlier_sessions, number_of_slots_needed,
-                                                                            field_type)
-            to_be_removed_reservations = {}
-
-            for reserved_date_str, reserved_time_slots in reserved_sessions.items():
-                if not self.is_date_in_view(reserved_date_str, field_type):
-                    number_of_slots_needed -= len(reserved_time_slots)
+            booked_sessions = self.get_attribute_with_fieldtype("booked_sessions", field_type)
+            reserved_out_of_view = SlotSet(slot for slot in reserved_sessions
+                                           if not self.is_date_in_view(slot.date_str, field_type))
+
+            plan = self.planner.plan(field_type, earlier_sessions, booked_sessions,
+                                     reserved_sessions - reserved_out_of_view, number_of_slots_needed,
+                                     reserved_out_of_view)
+            if plan.rejected:
+                self.log.info(
+                    f"Skipped {len(plan.rejected)} {field_type.upper()} slot(s) the portal would refuse "
+                    f"({self.planner.avoided_clicks} clicks avoided in total): "
+                    f"{', '.join(f'{slot.element_key} ({rule_name})' for slot, rule_name in plan.rejected.items())}")
+
+            # reserved slots later than the planned ones are freed up first, so they don't count against the maximum
+            for slot in plan.to_unreserve:
+                element_id = web_elements_in_view[slot.element_key]
+                self.click_slot(element_id)
+
+                alert_found, alert_text = self.confirm_slot_click(element_id, SlotState.AVAILABLE)
+                if alert_found is None:
+                    self.log.warning(
+                        f"Could not confirm unreserving a {field_type.upper()} slot on {slot.date_str} : "
+                        f"{slot.time_str}: {alert_text}")
+                    # counted as still held until a grid read says otherwise
+                    plan.to_reserve.discard(plan.to_reserve.last())
+                elif alert_found:
+                    self.log.error(
+                        f"Failed to unreserve a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}. "
+                        f"Reason: {alert_text}")
+                    # still held, so one planned reservation less fits
+                    plan.to_reserve.discard(plan.to_reserve.last())
+                else:
+                    self.log.info(
+                        f"Successfully unreserved a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}.")
+                    reserved_sessions.discard(slot)
+                    available_sessions.add_slot(slot)
+
+            if plan.to_reserve:
+                self.log.info(f"Number of slots to reserve for {field_type.upper()} is: {len(plan.to_reserve)}")
+
+            for slot in plan.to_reserve:
+                # rules learned from an alert earlier in this loop may already rule the slot out
+                broken_rule = self.planner.get_broken_rule(field_type, slot, booked_sessions, list(reserved_sessions))
+                if broken_rule:
+                    self.log.info(f"Skipped reserving a {field_type.upper()} slot on {slot.date_str} : "
+                                  f"{slot.time_str} ({broken_rule.name}).")
+                    self.planner.avoided_clicks += 1
+                    if broken_rule.stops_reserving:
+                        break
                     continue
 
-                reserved_date = convert_to_datetime(reserved_date_str)
+                element_id = web_elements_in_view[slot.element_key]
+                self.click_slot(element_id)
+                self.log.info(
+                    f"Attempting to reserve a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}.")
+
+                alert_found, alert_text = self.confirm_slot_click(element_id, SlotState.RESERVED)
+                if alert_found and "non-computerised" in alert_text:
+                    alert_found, alert_text = self.confirm_slot_click(element_id, SlotState.RESERVED)
 
-                for earliest_date_str in earliest_sessions_to_be_reserved:
-                    earliest_date = convert_to_datetime(earliest_date_str)
-                    if reserved_date <= earliest_date:
-                        number_of_slots_needed -= len(reserved_time_slots)
+                if alert_found is None:
+                    self.log.warning(
+                        f"Could not confirm reserving a {field_type.upper()} slot on {slot.date_str} : "
+                        f"{slot.time_str}: {alert_text}")
+                    continue
+                if alert_found:
+                    self.log.error(
+                        f"Failed to reserve a {field_type.upper()} slot on {slot.date_str} : {slot.time_str}. "
+                        f"Reason: {alert_text}")
+                    learned_rule = self.planner.learn(field_type, alert_text,
+                                                      held_count=self.count_held_reservations(field_type))
+                    if learned_rule and learned_rule.stops_reserving:
                         break
-                else:  # only executed if reserved date is not the earliest session
-                    to_be_removed_reservations.update({reserved_date_str: []})
-                    for reserved_time_slot in reserved_time_slots:
-                        input_element_id = web_elements_in_view[f"{reserved_date_str} : {reserved_time_slot}"]
-                        input_element = selenium_common.wait_for_elem(self.driver, By.ID, input_element_id)
-                        input_element.click()
-
-                        alert_found, alert_text = selenium_common.dismiss_alert(self.driver, timeout=10)
-                        if alert_found:
-                            self.log.error(
-                                f"Failed to unreserve a {field_type.upper()} slot on "
-                                f"{reserved_date_str} : {reserved_time_slot}. Reason: {alert_text}")
-                            number_of_slots_needed -= 1
-                            break
-                        else:
-                            self.log.info(
-                                f"Successfully reserved a {field_type.upper()} slot on "
-                                f"{reserved_date_str} : {reserved_time_slot}.")
-                            to_be_removed_reservations[reserved_date_str].append(reserved_time_slot)
-
-            for date_str, time_slots in to_be_removed_reservations.items():
-                if date_str not in available_sessions:
-                    available_sessions.update({date_str: list(time_slots)})
-
-                for time_slot in time_slots:
-                    reserved_sessions[date_str].remove(time_slot)
-                    available_sessions[date_str].append(time_slot)
-                if len(reserved_sessions[date_str]) == 0:
-                    del reserved_sessions[date_str]
-
-            if number_of_slots_needed > 0:
-                self.log.info(f"Number of slots to reserve for {field_type.upper()} is: {number_of_slots_needed}")
-                earliest_sessions_to_be_reserved = self.get_earliest_time_slots(earlier_sessions,
-                                                                                number_of_slots_needed, field_type)
-
-                for date_str, time_slots in earliest_sessions_to_be_reserved.items():
-                    for time_slot in time_slots:
-                        input_element_id = web_elements_in_view[f"{date_str} : {time_slot}"]
-                        input_element = selenium_common.wait_for_elem(self.driver, By.ID, input_element_id)
-                        input_element.click()
-                        self.log.info(
-                            f"Attempting to reserve a {field_type.upper()} slot on {date_str} : {time_slot}.")
-
-                        alert_found, alert_text = selenium_common.dismiss_alert(self.driver, timeout=10)
-                        if alert_found and "non-computerised" in alert_text:
-                            alert_found, alert_text = selenium_common.dismiss_alert(self.driver, timeout=10)
-
-                        if alert_found:
-                            self.log.error(
-                                f"Failed to reserve a {field_type.upper()} slot on {date_str} : {time_slot}. "
-                                f"Reason: {alert_text}")
-                            if any(e in alert_text for e in ["Store Value:", "before", "exceeded the maximum number"]):
-                                break
-                            elif "Back to Back session is not allowed" in alert_text:  # for simulator
-                                continue
-                    else:  # only executed if there is no alert
-                        if date_str not in reserved_sessions:
-                            reserved_sessions[date_str] = [time_slot]
-                        else:
-                            reserved_sessions[date_str].append(time_slot)
-
-                        available_sessions[date_str].remove(time_slot)
-                        if len(available_sessions[date_str]) == 0:
-                            del available_sessions[date_str]
-                        continue
-                    break  # only executed if there is an alert
+                    continue
+
+                reserved_sessions.add_slot(slot)
+                available_sessions.discard(slot)
 
-        self.set_attribute_with_fieldtype("reserved_sessions", field_type, dict(reserved_sessions))
-        self.set_attribute_with_fieldtype("available_sessions", field_type, dict(available_sessions))
         self.update_earlier_sessions(field_type)
         self.set_attribute_with_fieldtype("cached_earlier_sessions", field_type,
-                                          dict(self.get_attribute_with_fieldtype("earlier_sessions", field_type)))
+                                          self.get_attribute_with_fieldtype("earlier_sessions", field_type).copy())
         notif_msg = self.create_notification_update(field_type)
         self.log.info(
             f"There are updates to {field_type.upper()} available sessions. More info here: \n{notif_msg}")